@@ -0,0 +1,57 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from container import CommandResult, DockerShell
+from container_pool import ContainerPool
+
+
+class AsyncDockerShell:
+    """
+    asyncio front for DockerShell. Every blocking Docker call runs on a bounded
+    thread pool, so an `async def` handler never stalls the event loop, and at most
+    *max_concurrency* container commands are in flight at once.
+
+    Backed either by a single DockerShell or by a ContainerPool, in which case each
+    call leases its own container (and therefore its own cwd).
+    """
+
+    def __init__(self, source: DockerShell | ContainerPool, max_concurrency: int = 4):
+        self.source = source
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="docker-exec")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _shell(self):
+        if isinstance(self.source, ContainerPool):
+            return self.source.lease()
+        return nullcontext(self.source)
+
+    async def _submit(self, timeout: float | None, func, *args):
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, func, *args)
+            # The command itself is killed at *timeout*; the grace period covers the kill round-trip
+            return await asyncio.wait_for(future, timeout + 5 if timeout is not None else None)
+
+    async def run_command(self, command: str, timeout: float | None = 30, max_bytes: int | None = None) -> str:
+        """Run *command* without blocking the loop. Raises TimeoutError past *timeout*."""
+        def call():
+            with self._shell() as shell:
+                return shell.run_command(command, max_bytes=max_bytes, timeout=timeout)
+
+        return await self._submit(timeout, call)
+
+    async def run_many(self, commands: list[str], stop_on_error: bool = False,
+                       timeout: float | None = 60) -> list[CommandResult]:
+        """Run a batch without blocking the loop; the batch is killed past *timeout* (see DockerShell.run_many)."""
+        def call():
+            with self._shell() as shell:
+                return shell.run_many(commands, stop_on_error, timeout=timeout)
+
+        return await self._submit(timeout, call)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if isinstance(self.source, ContainerPool):
+            self.source.close()
@@ -0,0 +1,161 @@
+"""
+Micro-benchmark for scraper._manual_fallback_scraper.
+
+Runs the lxml single-pass implementation against the original BeautifulSoup
+(html.parser) implementation on a generated fixture corpus, checks that both
+produce identical output, and prints the timings.
+
+    python bench_scraper.py [rounds]
+"""
+import random
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+from scraper import _manual_fallback_scraper
+
+
+def reference_fallback_scraper(html_content: str) -> tuple[str, str] | None:
+    """The original BeautifulSoup implementation (comments trimmed), kept as the reference."""
+    soup = BeautifulSoup(html_content, "html.parser")
+
+    page_title = soup.title.string.strip() if soup.title else 'No Title'
+
+    for tag in soup(['nav', 'header', 'footer', 'aside', 'form', 'script', 'style', 'button', 'iframe']):
+        tag.decompose()
+    for selector in [".sidebar", "#sidebar", ".comments", "#comments", ".share", ".social", ".ad", "#ads"]:
+        for element in soup.select(selector):
+            element.decompose()
+
+    main_content = None
+    selectors = [
+        'main', 'article', 'div[class*="post"]', 'div[id="content"]',
+        'div[class*="content"]', 'div[id="main"]', 'div[class*="main"]',
+        'div[class*="entry-content"]'
+    ]
+    for selector in selectors:
+        main_content = soup.select_one(selector)
+        if main_content:
+            break
+
+    if not main_content:
+        main_content = soup.body
+        if not main_content:
+            return None
+
+    content_parts = []
+    for element in main_content.find_all(['h1', 'h2', 'h3', 'p', 'pre', 'li'], recursive=True):
+        text = ''
+        if element.name.startswith('h'):
+            text = f"\n\n{element.get_text(strip=True)}\n"
+        elif element.name == 'pre':
+            text = f"\n```\n{element.get_text()}\n```\n"
+        else:
+            text = element.get_text(strip=True)
+        if len(text.split()) > 4:
+            content_parts.append(text)
+
+    full_text = "\n".join(content_parts)
+    clean_text = re.sub(r'\n{3,}', '\n\n', full_text).strip()
+
+    return page_title, clean_text
+
+
+WORDS = ("vault note obsidian scraper python docker search index token latency cache "
+         "parser element content article sidebar comment markdown link tag").split()
+
+
+def _sentence(rng: random.Random, low: int = 2, high: int = 18) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(low, high))]
+    if rng.random() < 0.2:
+        words[rng.randrange(len(words))] = f"<b>{rng.choice(WORDS)}</b>"
+    if rng.random() < 0.1:
+        words.append("&amp; caf&eacute;&nbsp;d&eacute;j&agrave;")
+    return " ".join(words)
+
+
+def _block(rng: random.Random, depth: int = 0) -> str:
+    kind = rng.choice(["p", "p", "p", "h2", "h3", "ul", "pre", "div", "noise"])
+    if kind == "ul":
+        items = "".join(f"<li>{_sentence(rng)}</li>" for _ in range(rng.randint(1, 6)))
+        return f"<ul>{items}</ul>"
+    if kind == "pre":
+        lines = "\n".join(f"    {_sentence(rng, 1, 6)}" for _ in range(rng.randint(1, 5)))
+        return f"<pre><code>{lines}</code></pre>"
+    if kind == "div" and depth < 3:
+        inner = "".join(_block(rng, depth + 1) for _ in range(rng.randint(1, 4)))
+        cls = rng.choice(["", "row", "wrapper card", "text-block"])
+        return f'<div class="{cls}">{inner}</div>'
+    if kind == "noise":
+        noise = rng.choice([
+            '<div class="share buttons">share this on social networks today now</div>',
+            '<div class="sidebar">' + _sentence(rng, 8) + '</div>',
+            '<aside><p>' + _sentence(rng, 8) + '</p></aside>',
+            '<form><p>' + _sentence(rng, 8) + '</p><button>Send it</button></form>',
+            '<script>var x = "<p>not text</p>";</script>',
+            '<!-- a comment with many many words inside it -->',
+            '<div id="ads"><p>' + _sentence(rng, 8) + '</p></div>',
+        ])
+        return noise
+    if kind in ("h2", "h3"):
+        return f"<{kind}>{_sentence(rng, 1, 8)}</{kind}>"
+    return f"<p>{_sentence(rng)}</p>"
+
+
+def make_page(seed: int, blocks: int) -> str:
+    rng = random.Random(seed)
+    body = "".join(_block(rng) for _ in range(blocks))
+    container = rng.choice([
+        "<main>{}</main>",
+        "<article>{}</article>",
+        '<div class="post-body">{}</div>',
+        '<div id="content">{}</div>',
+        '<div class="page-content wide">{}</div>',
+        '<div id="main">{}</div>',
+        '<div class="main-column">{}</div>',
+        "<div>{}</div>",
+    ])
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        f"<title> Page {seed} </title><style>p {{ color: red; }}</style></head><body>"
+        "<header><nav><ul><li>Home link with several words here</li></ul></nav></header>"
+        f"<div class=\"intro\"><p>{_sentence(rng, 6)}</p></div>"
+        f"{container.format(body)}"
+        f"<div class=\"comments\"><p>{_sentence(rng, 6)}</p></div>"
+        "<footer><p>Copyright notice with enough words to count</p></footer>"
+        "</body></html>"
+    )
+
+
+def corpus() -> list[str]:
+    pages = [make_page(seed, blocks) for seed in range(40) for blocks in (5, 60)]
+    pages.append(make_page(1000, 2000))  # one very large page
+    return pages
+
+
+def _time(func, pages: list[str], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for page in pages:
+            func(page)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    pages = corpus()
+
+    mismatches = [i for i, page in enumerate(pages)
+                  if _manual_fallback_scraper(page) != reference_fallback_scraper(page)]
+    print(f"{len(pages)} fixture pages, {len(mismatches)} output mismatches {mismatches or ''}")
+
+    reference = _time(reference_fallback_scraper, pages, rounds)
+    current = _time(_manual_fallback_scraper, pages, rounds)
+    print(f"BeautifulSoup/html.parser: {reference * 1000:8.1f} ms")
+    print(f"lxml single pass:          {current * 1000:8.1f} ms")
+    print(f"speedup:                   {reference / current:8.1f}x")
+    sys.exit(1 if mismatches else 0)
@@ -1,13 +1,531 @@
+import codecs
+import io
+import posixpath
+import re
+import secrets
+import shlex
+import socket
+import struct
+import tarfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass
+
 import docker
 
+from vault_tree import VaultTreeIndex
+
+
+@dataclass
+class CommandResult:
+    """Outcome of one command from a batch (`DockerShell.run_many`)."""
+    command: str
+    stdout: str
+    stderr: str
+    exit_code: int
+    duration: float  # seconds, measured inside the container
+    cwd: str
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0
+
+
+class ShellSessionError(RuntimeError):
+    """Raised when the persistent bash session dies or stops answering."""
+
+    def __init__(self, message: str, results: list[CommandResult] | None = None):
+        super().__init__(message)
+        # What the batch produced before the session died (see _parse_frames)
+        self.results = results or []
+
+
+# Commands that only inspect the filesystem (when used without write flags or redirections).
+# awk and sed are left out on purpose: their scripts can write files (`print > "f"`, `w file`).
+_READ_ONLY_COMMANDS = {
+    "ls", "find", "grep", "egrep", "fgrep", "rg", "cat", "head", "tail", "wc", "tree", "stat", "file",
+    "du", "df", "pwd", "echo", "printf", "sort", "uniq", "cut", "tr", "basename",
+    "dirname", "realpath", "readlink", "test", "[", "true", "diff", "cmp", "md5sum", "sha1sum",
+    "sha256sum", "date", "whoami", "id", "uname", "which", "type", "column", "nl", "less", "more",
+}
+# Newlines separate commands just like `;`
+_PUNCTUATION = "();<>|&\n"
+_CONTROL_TOKENS = {"|", "||", "&&", ";", "&", "(", ")", ";;", "|&"}
+_OUTPUT_REDIRECTS = {">", ">>", ">|", "&>", "&>>", ">&", "<>"}
+_INPUT_REDIRECTS = {"<", "<<", "<<<", "<&"}
+_FIND_WRITE_ACTIONS = ("-delete", "-exec", "-execdir", "-ok", "-okdir", "-fprint", "-fprint0", "-fprintf", "-fls")
+
+
+def _tokenize(command: str) -> list[str] | None:
+    """Shell tokens of *command*, or None when it can't be classified safely."""
+    if "$(" in command or "`" in command:
+        return None
+    try:
+        lexer = shlex.shlex(command, posix=True, punctuation_chars=_PUNCTUATION)
+        lexer.whitespace = " \t\r"
+        lexer.whitespace_split = True
+        return list(lexer)
+    except ValueError:
+        return None
+
+
+def _simple_commands(tokens: list[str]) -> list[tuple[list[str], list[tuple[str, str]]]] | None:
+    """
+    Split *tokens* into simple commands: (argv, [(redirect operator, target)]).
+    Returns None on an operator it doesn't know.
+    """
+    commands = []
+    argv, redirects = [], []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token and all(char in _PUNCTUATION for char in token):
+            if token in _OUTPUT_REDIRECTS or token in _INPUT_REDIRECTS:
+                if argv and argv[-1].isdigit():
+                    argv.pop()  # `2>` - the fd number belongs to the redirection
+                redirects.append((token, tokens[i + 1] if i + 1 < len(tokens) else ""))
+                i += 2
+                continue
+            # `;\n`, `|\n` or blank lines: a newline ends a command like `;`
+            if token.replace("\n", "") not in _CONTROL_TOKENS | {""}:
+                return None
+            if argv or redirects:
+                commands.append((argv, redirects))
+            argv, redirects = [], []
+        else:
+            argv.append(token)
+        i += 1
+    if argv or redirects:
+        commands.append((argv, redirects))
+    return commands
+
+
+def _writes_output(op: str, target: str) -> bool:
+    if op == ">&" and (target.isdigit() or target == "-"):
+        return False  # `2>&1`: duplicates a descriptor
+    return op in _OUTPUT_REDIRECTS and target != "/dev/null"
+
+
+def _positional(args: list[str], with_value: tuple[str, ...] = ()) -> list[str]:
+    operands, skip = [], False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in with_value:
+            skip = True
+        elif arg == "-" or not arg.startswith("-"):
+            operands.append(arg)
+    return operands
+
+
+def _writes_files(program: str, args: list[str]) -> bool:
+    """Write flags and output operands of otherwise read-only commands."""
+    if program == "find":
+        return any(arg.startswith(_FIND_WRITE_ACTIONS) for arg in args)
+    if program == "sort":
+        return any(arg.startswith("--output") or (arg.startswith("-") and not arg.startswith("--") and "o" in arg)
+                   for arg in args)
+    if program == "tree":
+        return "-o" in args
+    if program == "uniq":
+        # `uniq INPUT OUTPUT` writes OUTPUT
+        return len(_positional(args, ("-f", "-s", "-w"))) > 1
+    return False
+
+
+def is_mutating_command(command: str) -> bool:
+    """
+    Conservative guess whether *command* may change state (files, cwd, processes).
+
+    Only pipelines made of known read-only commands, without output redirection
+    to a file or write flags/operands, count as read-only; anything unparseable does not.
+    """
+    tokens = _tokenize(command)
+    commands = _simple_commands(tokens) if tokens is not None else None
+    if commands is None:
+        return True
+
+    for argv, redirects in commands:
+        if any(_writes_output(op, target) for op, target in redirects):
+            return True
+        while argv and argv[0] == "xargs":
+            argv = argv[1:]  # what matters is the command xargs runs
+        if not argv:
+            continue
+        program, args = argv[0], argv[1:]
+        if program not in _READ_ONLY_COMMANDS or _writes_files(program, args):
+            return True
+    return False
+
+
+# Read-only commands whose output only depends on the filesystem (no clock, no disk usage)
+_CACHEABLE_COMMANDS = _READ_ONLY_COMMANDS - {"date", "df", "du", "less", "more"}
+# find arguments allowed in a cached command: tests on names/types/sizes, printing. Time-relative
+# tests (-mmin, -mtime, ...) are not, their answer changes with the clock.
+_FIND_FLAGS = {"-L", "-H", "-P", "-depth", "-follow", "-empty", "-not", "!", "-o", "-a", "-or", "-and",
+               "(", ")", "-print", "-print0", "-prune", "-ls", "-readable", "-true", "-false"}
+_FIND_TESTS = {"-name", "-iname", "-path", "-ipath", "-wholename", "-iwholename", "-regex", "-iregex",
+               "-regextype", "-type", "-xtype", "-maxdepth", "-mindepth", "-size", "-newer", "-printf",
+               "-samefile", "-links", "-perm"}
+
+
+def _inside(path: str, root: str) -> bool:
+    return root == "/" or path == root or path.startswith(root + "/")
+
+
+def _operands_inside(args: list[str], cwd: str, root: str) -> bool:
+    """Every path-like operand (and `--opt=value` value) of *args* resolves under *root*."""
+    for arg in args:
+        if arg.startswith("-"):
+            if "=" not in arg:
+                continue
+            arg = arg.split("=", 1)[1]
+        if arg.startswith("~") or not _inside(posixpath.normpath(posixpath.join(cwd, arg)), root):
+            return False
+    return True
+
+
+def is_cacheable_command(command: str, cwd: str = "/", root: str | None = None) -> bool:
+    """
+    Whether the output of *command*, run in *cwd*, can be reused while the vault
+    under *root* is unchanged.
+
+    Opt-in by shape: every simple command must be a read-only, deterministic
+    program (no xargs, no clock) with read-only arguments, and find may only use
+    the tests and actions in _FIND_FLAGS/_FIND_TESTS. Anything that may read
+    outside *root* is refused: `$` expansions (`$RANDOM`, `$EPOCHSECONDS`),
+    printf's `%(...)T` clock format, a cwd or path operand outside *root* (/proc,
+    /tmp, ...), and every command when there is no *root* at all.
+    """
+    if root is None or "$" in command:
+        return False
+    root = root.rstrip("/") or "/"
+    cwd = posixpath.normpath(cwd or "/")
+    if not _inside(cwd, root):
+        return False
+    tokens = _tokenize(command)
+    commands = _simple_commands(tokens) if tokens is not None else None
+    if not commands or is_mutating_command(command):
+        return False
+
+    for argv, redirects in commands:
+        if not argv or argv[0] not in _CACHEABLE_COMMANDS:
+            return False
+        if argv[0] == "printf" and any("%(" in arg for arg in argv[1:]):
+            return False
+        if argv[0] == "find":
+            args = iter(argv[1:])
+            for arg in args:
+                if arg in _FIND_TESTS:
+                    next(args, None)
+                elif arg.startswith("-") and arg not in _FIND_FLAGS:
+                    return False
+        inputs = [target for op, target in redirects if op == "<"]
+        if not _operands_inside(argv[1:] + inputs, cwd, root):
+            return False
+    return True
+
+
+def is_bare_cd(command: str) -> bool:
+    """`cd DIR` on its own: changes the cwd, not the vault."""
+    tokens = _tokenize(command)
+    commands = _simple_commands(tokens) if tokens is not None else None
+    return commands is not None and len(commands) == 1 and commands[0][0][:1] == ["cd"] and not commands[0][1]
+
+
+class CommandCache:
+    """
+    LRU cache of read-only command output keyed on (cwd, command, max_bytes, vault
+    generation). The generation is bumped by every mutating command, every
+    `write_files` and every change the tree index detects, so entries from before
+    a write simply stop matching and age out.
+    """
+
+    def __init__(self, max_entries: int = 256, max_output: int = 256 * 1024):
+        self.max_entries = max_entries
+        self.max_output = max_output
+        self.generation = 0
+        self._entries: OrderedDict[tuple, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0  # commands outside the cacheable shapes
+        self.invalidations = 0
+
+    @staticmethod
+    def cacheable(command: str, cwd: str = "/", root: str | None = None) -> bool:
+        return is_cacheable_command(command, cwd, root)
+
+    def key(self, cwd: str, command: str, max_bytes: int | None) -> tuple:
+        return cwd, command.strip(), max_bytes, self.generation
+
+    def get(self, key: tuple) -> str | None:
+        with self._lock:
+            output = self._entries.get(key)
+            if output is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return output
+
+    def put(self, key: tuple, output: str):
+        with self._lock:
+            # Computed against a generation that has moved on meanwhile: not worth keeping
+            if key[-1] != self.generation or len(output) > self.max_output:
+                return
+            self._entries[key] = output
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def invalidate(self, *_):
+        """Start a new vault generation (also usable as a tree index on_change callback)."""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            # Older generations can never match again
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "generation": self.generation,
+                "entries": len(self._entries),
+            }
+
+
+def _frame_script(commands: list[str], marker: str, stop_on_error: bool = False) -> str:
+    """
+    Build one bash script running *commands* in order. After each command a
+    sentinel line `<marker> <index> <exit code> <start> <end> <cwd>` is printed on
+    stdout and `<marker> <index>` on stderr; `<marker> end` closes both streams.
+    """
+    lines = []
+    for index, command in enumerate(commands):
+        if stop_on_error:
+            lines.append('if [ -z "$__obsidian_abort" ]; then')
+        # `eval` keeps a malformed command from swallowing the sentinel lines,
+        # and stdin is closed so nothing can read the commands that follow.
+        lines += [
+            "__obsidian_t0=$EPOCHREALTIME",
+            f"eval {shlex.quote(command)} </dev/null",
+            "__obsidian_rc=$?",
+            f"printf '\\n%s %d %d %s %s %s\\n' '{marker}' {index} \"$__obsidian_rc\" "
+            "\"$__obsidian_t0\" \"$EPOCHREALTIME\" \"$PWD\"",
+            f"printf '\\n%s %d\\n' '{marker}' {index} >&2",
+        ]
+        if stop_on_error:
+            lines += ['[ "$__obsidian_rc" -ne 0 ] && __obsidian_abort=1', "fi"]
+    if stop_on_error:
+        lines.append("unset __obsidian_abort")
+    lines += [
+        f"printf '\\n%s end\\n' '{marker}'",
+        f"printf '\\n%s end\\n' '{marker}' >&2",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _parse_frames(commands: list[str], stdout: bytes, stderr: bytes, marker: str,
+                  exit_code: int | None = None, notice: str = "") -> list[CommandResult]:
+    """
+    Split the output of a `_frame_script` run back into per-command results.
+
+    When the script ended early (a command ran `exit`, or the shell was killed),
+    the command that was running gets the shell's *exit_code* (-1 if unknown) and
+    *notice* appended to its stderr, and every command after it a failed result
+    with exit code -1.
+    """
+    out_text = stdout.decode(errors="ignore")
+    err_text = stderr.decode(errors="ignore")
+
+    errors = {}
+    position = 0
+    for match in re.finditer(rf"\n{marker} (\d+)\n", err_text):
+        errors[int(match.group(1))] = err_text[position:match.start()]
+        position = match.end()
+    err_tail = err_text[position:]
+
+    results = []
+    position = 0
+    for match in re.finditer(rf"\n{marker} (\d+) (-?\d+) (\S*) (\S*) (.*)\n", out_text):
+        index = int(match.group(1))
+        started, finished = (float(value.replace(",", ".") or 0) for value in match.group(3, 4))
+        results.append(CommandResult(
+            command=commands[index],
+            stdout=out_text[position:match.start()],
+            stderr=errors.get(index, ""),
+            exit_code=int(match.group(2)),
+            duration=max(finished - started, 0.0),
+            cwd=match.group(5),
+        ))
+        position = match.end()
+
+    if len(results) < len(commands) and f"\n{marker} end\n" not in out_text:
+        index = len(results)
+        cwd = results[-1].cwd if results else ""
+        results.append(CommandResult(commands[index], out_text[position:], err_tail + notice,
+                                     -1 if exit_code is None else exit_code, 0.0, cwd))
+        for command in commands[index + 1:]:
+            results.append(CommandResult(command, "", f"⚠️ Not run: the batch ended at command {index}.",
+                                         -1, 0.0, cwd))
+    return results
+
+
+# Kills every process whose environment carries OBSIDIAN_SESSION=$1, i.e. everything an
+# exec started with that marker, however deep, even before it had a chance to record a pid
+_KILL_MARKED_SCRIPT = (
+    'for f in /proc/[0-9]*/environ; do\n'
+    '  grep -qz "^OBSIDIAN_SESSION=$1\\$" "$f" 2>/dev/null && { p=${f#/proc/}; kill -KILL "${p%/environ}"; }\n'
+    'done 2>/dev/null\n'
+)
+
+
+def _kill_marked(api, container_id: str, marker: str):
+    exec_id = api.exec_create(container_id, ["bash", "-c", _KILL_MARKED_SCRIPT, "kill", marker])["Id"]
+    api.exec_start(exec_id)
+
+
+class _ShellSession:
+    """
+    One long-lived `bash` attached to the container over the exec socket.
+    Commands are framed by `_frame_script`, so consecutive commands share a single
+    process (cwd, exported variables, functions) without paying for a new exec each time.
+    """
+
+    def __init__(self, api, container_id: str, workdir: str, timeout: float | None = None):
+        self.marker = f"__OBSIDIAN_{secrets.token_hex(8)}__"
+        self.timeout = timeout
+        self._api = api
+        self._container_id = container_id
+        exec_id = api.exec_create(
+            container_id,
+            ["bash", "--noprofile", "--norc"],
+            stdin=True,
+            stdout=True,
+            stderr=True,
+            tty=False,
+            workdir=workdir,
+            # Inherited by everything the session starts, so kill() can find it all
+            environment={"OBSIDIAN_SESSION": self.marker},
+        )["Id"]
+        self._socket = api.exec_start(exec_id, socket=True)
+        self._raw = getattr(self._socket, "_sock", self._socket)
+        self._raw.settimeout(timeout)
+        self._buffers = {1: bytearray(), 2: bytearray()}
+        # One bash can only run one batch at a time
+        self._lock = threading.Lock()
+
+    def execute(self, command: str, timeout: float | None = None) -> CommandResult:
+        """Run a single *command* in the session."""
+        return self.execute_many([command], timeout=timeout)[0]
+
+    def execute_many(self, commands: list[str], stop_on_error: bool = False,
+                     timeout: float | None = None) -> list[CommandResult]:
+        """
+        Send the whole batch in one write and read back every framed result.
+        Past *timeout* seconds (or the session timeout without output) the session
+        and everything it started are killed and ShellSessionError is raised.
+        """
+        end = f"\n{self.marker} end\n".encode()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._lock:
+            try:
+                # If a command ends the shell, report its exit status before the socket closes
+                trap = f"trap 'printf \"\\n%s exit %d\\n\" {self.marker} $?' EXIT\n"
+                self._raw.settimeout(self.timeout)
+                self._raw.sendall((trap + _frame_script(commands, self.marker, stop_on_error)).encode())
+                while end not in self._buffers[1] or end not in self._buffers[2]:
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise socket.timeout(f"batch timed out after {timeout}s")
+                        self._raw.settimeout(min(remaining, self.timeout or remaining))
+                    self._read_frame()
+            except (OSError, socket.timeout, ShellSessionError) as e:
+                timed_out = isinstance(e, socket.timeout)
+                if timed_out:
+                    self.kill()
+                self.close()
+                # Keep what finished before bash exited (e.g. on `exit`) or stopped answering
+                stdout = bytes(self._buffers[1])
+                exited = re.search(rf"\n{self.marker} exit (\d+)\n".encode(), stdout)
+                notice = f"\n⚠️ Command killed: {e or 'session timed out'}." if timed_out else ""
+                results = _parse_frames(commands, stdout[:exited.start()] if exited else stdout,
+                                        bytes(self._buffers[2]), self.marker,
+                                        int(exited.group(1)) if exited else None, notice)
+                raise ShellSessionError(str(e) or "session timed out", results) from e
+
+            stdout = self._take(1, end)
+            stderr = self._take(2, end)
+        return _parse_frames(commands, stdout, stderr, self.marker)
+
+    def _read_frame(self):
+        header = self._recv_exactly(8)
+        stream, size = struct.unpack(">BxxxL", header)
+        self._buffers.get(stream, self._buffers[1]).extend(self._recv_exactly(size))
+
+    def _recv_exactly(self, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = self._raw.recv(size - len(data))
+            if not chunk:
+                self.close()
+                raise ShellSessionError("bash session exited")
+            data.extend(chunk)
+        return bytes(data)
+
+    def _take(self, stream: int, end: bytes) -> bytes:
+        buffer = self._buffers[stream]
+        stop = buffer.find(end) + len(end)
+        data = bytes(buffer[:stop])
+        del buffer[:stop]
+        return data
+
+    def kill(self):
+        """Kill the session's bash and every process it started (found by their environment)."""
+        try:
+            _kill_marked(self._api, self._container_id, self.marker)
+        except docker.errors.DockerException as e:
+            print(f"[DockerShell] Could not kill timed-out session: {e}")
+
+    def close(self):
+        try:
+            self._raw.close()
+        except OSError:
+            pass
+
+
 class DockerShell:
-    def __init__(self, container_name="my_ubuntu_container", image="obsidian_dock", workdir="/opt"):
+    def __init__(self, container_name="my_ubuntu_container", image="obsidian_dock", workdir="/opt",
+                 persistent: bool = False, session_timeout: float | None = 120):
         self.client = docker.from_env()
         self.container_name = container_name
         self.image = image
         self.workdir = workdir
         self.current_path = workdir
         self.container = self._get_or_start_container()
+        # Opt-in: keep one bash alive across commands instead of one exec per command
+        self.persistent = persistent
+        self.session_timeout = session_timeout
+        self._session = None
+        self.tree_index: VaultTreeIndex | None = None
+        # Read-only command output, reused until something writes to the vault
+        self.command_cache = CommandCache()
+        self.probe_interval = 5.0  # seconds between tree index checks before serving a cached result
+        self._last_probe = 0.0
 
     def _get_or_start_container(self):
         try:
@@ -28,10 +546,51 @@ class DockerShell:
             )
         return self.client.containers.get(self.container_name)  # Ensure fresh reference
 
-    def run_command(self, command: str) -> str:
+    def run_command(self, command: str, max_bytes: int | None = None, timeout: float | None = None) -> str:
+        """
+        Run *command* in the current path and return its output.
+        With *max_bytes* or *timeout* the output is streamed and the command is
+        killed once the cap or the deadline is hit (see stream_command). In
+        persistent mode the session timeout applies and the output is truncated.
+
+        Read-only commands of a known shape that only read under the tree index root
+        (see is_cacheable_command) are answered from the command cache while the
+        vault generation is unchanged; without a tree index nothing is cached. Any mutating
+        command other than a bare `cd` starts a new generation.
+        """
         if command.strip() in ["exit", "quit"]:
             return "Exiting..."
 
+        root = self.tree_index.root if self.tree_index is not None else None
+        if not CommandCache.cacheable(command, self.current_path, root):
+            self.command_cache.bypass()
+            output = self._run_command(command, max_bytes, timeout)
+            if is_mutating_command(command) and not is_bare_cd(command):
+                self.command_cache.invalidate()
+            return output
+
+        self._probe_vault()
+        key = self.command_cache.key(self.current_path, command, max_bytes)
+        output = self.command_cache.get(key)
+        if output is None:
+            output = self._run_command(command, max_bytes, timeout)
+            # A timeout or a dead session says nothing about the command's real output
+            if "⚠️ Command killed after" not in output and not output.startswith("❌ Shell session error"):
+                self.command_cache.put(key, output)
+        return output
+
+    def _probe_vault(self):
+        """Let the tree index notice changes made behind our back (it bumps the generation on change)."""
+        if self.tree_index is None or time.monotonic() - self._last_probe < self.probe_interval:
+            return
+        self._last_probe = time.monotonic()
+        self.tree_index.refresh()
+
+    def _run_command(self, command: str, max_bytes: int | None, timeout: float | None) -> str:
+        if self.persistent:
+            output = self._run_in_session(command, timeout)
+            return output[:max_bytes] if max_bytes else output
+
         # Handle 'cd' separately to change context
         if command.strip().startswith("cd "):
             target = command.strip().split("cd", 1)[1].strip()
@@ -44,11 +603,286 @@ class DockerShell:
             else:
                 return "❌ Invalid directory."
 
+        if max_bytes is not None or timeout is not None:
+            return "".join(self.stream_command(command, max_bytes=max_bytes, timeout=timeout)).strip()
+
         # For all other commands, run them in the current path
         full_cmd = f"bash -c 'cd \"{self.current_path}\" && {command}'"
         result = self.container.exec_run(full_cmd, tty=True)
         return result.output.decode(errors="ignore").strip()
 
+    def stream_command(
+            self,
+            command: str,
+            max_bytes: int | None = None,
+            max_lines: int | None = None,
+            timeout: float | None = None,
+    ) -> Iterator[str]:
+        """
+        Run *command* in the current path and yield its output as decoded chunks
+        while it is produced. Reading stops once *max_bytes* or *max_lines* is
+        reached or *timeout* seconds have elapsed; the command and every process
+        it started are then killed and a final notice chunk says why the output
+        ended. Closing the generator early kills the command as well.
+
+        Raises:
+            ValueError: for a *timeout* that isn't positive.
+        """
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"timeout must be positive, got {timeout}")
+        marker = f"__OBSIDIAN_{secrets.token_hex(8)}__"
+        script = (
+            # No CR/LF translation on the tty, so chunks decode like plain output
+            f"stty -onlcr <&1 2>/dev/null\n"
+            f"cd {shlex.quote(self.current_path)} || exit 1\n"
+            f"{command}\n"
+        )
+        api = self.client.api
+        # Inherited by everything the command starts (backgrounded or setsid'd children
+        # included), so _kill_exec finds it all even before the command got going
+        exec_id = api.exec_create(self.container.id, ["bash", "-c", script], tty=True,
+                                  environment={"OBSIDIAN_SESSION": marker})["Id"]
+        chunks = api.exec_start(exec_id, stream=True, tty=True)
+
+        timed_out = threading.Event()
+
+        def on_timeout():
+            timed_out.set()
+            self._kill_exec(marker)
+
+        timer = threading.Timer(timeout, on_timeout) if timeout is not None else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        read_bytes = 0
+        read_lines = 0
+        notice = None
+        finished = False
+        try:
+            for chunk in chunks:
+                if max_bytes is not None and read_bytes + len(chunk) > max_bytes:
+                    chunk = chunk[:max_bytes - read_bytes]
+                    notice = f"\n⚠️ Output truncated after {max_bytes} bytes."
+                read_bytes += len(chunk)
+                text = decoder.decode(chunk)
+
+                if max_lines is not None and read_lines + text.count("\n") >= max_lines:
+                    keep = max_lines - read_lines
+                    text = "".join(text.splitlines(keepends=True)[:keep])
+                    notice = f"\n⚠️ Output truncated after {max_lines} lines."
+                read_lines += text.count("\n")
+
+                if text:
+                    yield text
+                if notice:
+                    break
+            else:
+                tail = decoder.decode(b"", final=True)
+                if tail:
+                    yield tail
+                if timed_out.is_set():
+                    notice = f"\n⚠️ Command killed after {timeout}s timeout."
+            finished = notice is None
+            if notice:
+                yield notice
+        finally:
+            if timer:
+                timer.cancel()
+            if not finished and not timed_out.is_set():
+                self._kill_exec(marker)
+
+    def _kill_exec(self, marker: str):
+        try:
+            _kill_marked(self.client.api, self.container.id, marker)
+        except docker.errors.DockerException as e:
+            print(f"[DockerShell] Could not kill streamed command: {e}")
+
+    def _get_session(self) -> _ShellSession:
+        if self._session is None:
+            self._session = _ShellSession(self.client.api, self.container.id, self.current_path,
+                                          timeout=self.session_timeout)
+        return self._session
+
+    def _run_in_session(self, command: str, timeout: float | None = None) -> str:
+        try:
+            result = self._get_session().execute(command, timeout)
+        except ShellSessionError as e:
+            # The next command transparently starts a fresh session in the last known cwd
+            self._session = None
+            return f"❌ Shell session error: {e}"
+
+        self.current_path = result.cwd
+        if command.strip().startswith("cd "):
+            if result.ok:
+                return f"Changed directory to {self.current_path}"
+            return "❌ Invalid directory."
+
+        output = result.stdout.strip()
+        errors = result.stderr.strip()
+        return "\n".join(part for part in (output, errors) if part)
+
+    def run_many(self, commands: list[str], stop_on_error: bool = False,
+                 timeout: float | None = None) -> list[CommandResult]:
+        """
+        Run a batch of commands in one round-trip, in order, sharing cwd and env.
+        Returns one CommandResult per command that ran; with *stop_on_error* the
+        batch stops after the first non-zero exit code. A command that ends the
+        shell (`exit`) gets its exit status and every command after it a result
+        with exit code -1; in persistent mode the next call starts a new session.
+        Past *timeout* seconds the batch is killed the same way: the running
+        command gets a notice in its stderr and the rest are not run.
+
+        Raises:
+            ValueError: for a *timeout* that isn't positive (`timeout 0` would mean no limit).
+        """
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"timeout must be positive, got {timeout}")
+        if not commands:
+            return []
+
+        if self.persistent:
+            try:
+                results = self._get_session().execute_many(commands, stop_on_error, timeout)
+            except ShellSessionError as e:
+                self._session = None
+                print(f"[DockerShell] Session error during batch: {e}")
+                results = e.results
+        else:
+            marker = f"__OBSIDIAN_{secrets.token_hex(8)}__"
+            script = f'cd {shlex.quote(self.current_path)} || exit 1\n' + _frame_script(commands, marker, stop_on_error)
+            argv = ["bash", "-c", script]
+            if timeout is not None:
+                # coreutils timeout signals its whole process group, pipelines and children included
+                argv = ["timeout", "--kill-after=2", str(timeout)] + argv
+            started = time.monotonic()
+            result = self.container.exec_run(argv, demux=True)
+            stdout, stderr = result.output
+            timed_out = (timeout is not None and result.exit_code in (124, 137)
+                         and time.monotonic() - started >= timeout)
+            notice = f"\n⚠️ Command killed after {timeout}s timeout." if timed_out else ""
+            results = _parse_frames(commands, stdout or b"", stderr or b"", marker, result.exit_code, notice)
+
+        cwds = [result.cwd for result in results if result.cwd]
+        if cwds:
+            self.current_path = cwds[-1]
+        if any(is_mutating_command(command) for command in commands):
+            self.command_cache.invalidate()
+        return results
+
+    # --- bulk file transfer (tar streams, no shell quoting) ---
+
+    def _absolute(self, path: str) -> str:
+        return posixpath.normpath(posixpath.join(self.current_path, path))
+
+    def write_files(self, files: dict[str, bytes | str], mode: int = 0o644) -> list[str]:
+        """
+        Write many files in one `put_archive` call. Contents go into a tar stream
+        as-is, so quotes, `$` or `EOF` lines in a note need no escaping. Missing
+        parent directories are created. Relative paths are resolved against the
+        current directory. Returns the absolute paths written.
+        """
+        buffer = io.BytesIO()
+        now = time.time()
+        written = []
+        with tarfile.open(fileobj=buffer, mode="w") as archive:
+            for path, content in files.items():
+                data = content.encode("utf-8") if isinstance(content, str) else content
+                target = self._absolute(path)
+                info = tarfile.TarInfo(target.lstrip("/"))
+                info.size = len(data)
+                info.mode = mode
+                info.mtime = now  # tar keeps member mtimes: use "now" so `find -newer` sees the write
+                archive.addfile(info, io.BytesIO(data))
+                written.append(target)
+
+        if not self.container.put_archive("/", buffer.getvalue()):
+            raise RuntimeError(f"put_archive failed for {len(written)} file(s)")
+        self.command_cache.invalidate()
+        if self.tree_index is not None:
+            self.tree_index.invalidate(*written)
+        return written
+
+    def read_files(self, paths: list[str], batch: int = 500) -> dict[str, bytes]:
+        """
+        Read many files as tar streams: `get_archive` for a single path, one
+        in-container `tar -c` per *batch* paths otherwise (get_archive takes one path
+        per call). Missing paths and directories are left out of the result.
+        """
+        targets = [self._absolute(path) for path in paths]
+        if len(targets) == 1:
+            try:
+                chunks, _ = self.container.get_archive(targets[0])
+            except docker.errors.NotFound:
+                return {}
+            data = b"".join(chunks)
+            with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+                member = archive.next()
+                if member is None or not member.isfile():
+                    return {}
+                return {targets[0]: archive.extractfile(member).read()}
+
+        contents = {}
+        for start in range(0, len(targets), batch):
+            relative = [target.lstrip("/") for target in targets[start:start + batch]]
+            # --no-recursion: directories are skipped rather than expanded
+            result = self.container.exec_run(
+                ["tar", "-cf", "-", "--no-recursion", "--ignore-failed-read", "-C", "/", "--", *relative],
+                demux=True,
+            )
+            stdout, _ = result.output
+            if not stdout:
+                continue
+            with tarfile.open(fileobj=io.BytesIO(stdout)) as archive:
+                for member in archive:
+                    if member.isfile():
+                        contents["/" + member.name] = archive.extractfile(member).read()
+        return contents
+
+    def reset(self, vault_root: str | None = None):
+        """
+        Scrub per-session state so the container can be handed to another session:
+
+        - the persistent session is closed and the cwd goes back to the workdir;
+        - every process but the container's PID 1 is killed (background jobs included);
+        - /tmp and /var/tmp are emptied;
+        - with *vault_root*, uncommitted changes to that git checkout are discarded.
+
+        Anything else (installed packages, files outside those paths) survives;
+        remove the container for a clean slate (ContainerPool's recycle=True).
+
+        Raises:
+            RuntimeError: The scrub failed; don't hand the container out again.
+        """
+        self.close()
+        self.current_path = self.workdir
+        script = (
+            # kill(-1) reaches every process except PID 1 and the caller itself
+            'kill -KILL -1 2>/dev/null\n'
+            'find /tmp /var/tmp -mindepth 1 -delete 2>/dev/null\n'
+            'if [ -n "$1" ] && [ -n "$(git -C "$1" status --porcelain 2>/dev/null)" ]; then\n'
+            '  git -C "$1" reset -q --hard && git -C "$1" clean -qfdx\n'
+            'fi\n'
+        )
+        result = self.container.exec_run(["bash", "-c", script, "reset", vault_root or ""])
+        if result.exit_code != 0:
+            raise RuntimeError(f"Reset of '{self.container_name}' failed: {result.output.decode(errors='ignore')}")
+        self.command_cache.invalidate()
+
+    def close(self):
+        """Shut down the persistent session, if one is open."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def enable_tree_index(self, root: str = "/opt/FMHY-RAG") -> VaultTreeIndex:
+        """Serve get_tree() for paths under *root* from an incrementally refreshed index."""
+        self.tree_index = VaultTreeIndex(self, root)
+        self.tree_index.on_change(self.command_cache.invalidate)
+        self.tree_index.refresh()
+        return self.tree_index
+
     def get_current_path(self):
         return self.current_path
 
@@ -60,10 +894,15 @@ class DockerShell:
     ) -> str:
         """
         List all entries under *path* up to *depth*.
-        Tries `tree` first; falls back to `find` if tree isn't installed.
+        Served from the tree index when one covers *path*; otherwise tries `tree`
+        first and falls back to `find` if tree isn't installed.
         """
         target_path = path or self.current_path
 
+        if self.tree_index is not None and self.tree_index.covers(target_path):
+            self.tree_index.refresh()
+            return self.tree_index.render(target_path, depth=depth, files_only=files_only)
+
         # First half of pipeline: choose tree or find
         primary_cmd = (
             # does `tree` exist?
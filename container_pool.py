@@ -0,0 +1,173 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import docker
+
+from container import DockerShell
+
+
+class ContainerPool:
+    """
+    Keeps *size* containers from the vault image warm and leases one DockerShell
+    per session, so starting a session is a queue pop instead of a container boot.
+
+    On release a shell is reset in the background (see DockerShell.reset: stray
+    processes killed, /tmp emptied) before it goes back to the idle queue. Vault
+    edits are kept, the vault is the product: only with *vault_root* set are
+    uncommitted changes under it discarded (`git reset --hard && git clean`). With recycle=True, once a container has
+    served *max_uses* leases, or when the reset fails, it is removed and replaced
+    by a fresh one instead.
+    """
+
+    def __init__(
+            self,
+            size: int = 2,
+            image: str = "obsidian_dock",
+            name_prefix: str = "obsidian_pool",
+            workdir: str = "/opt",
+            recycle: bool = False,
+            max_uses: int | None = None,
+            vault_root: str | None = None,
+    ):
+        self.size = size
+        self.image = image
+        self.name_prefix = name_prefix
+        self.workdir = workdir
+        self.vault_root = vault_root
+        self.recycle = recycle
+        self.max_uses = max_uses
+        self.client = docker.from_env()
+
+        self._idle: queue.Queue[DockerShell] = queue.Queue()
+        self._uses: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._leased = 0
+        self._leases = 0
+        self._recycled = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._closed = False
+
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            for shell in executor.map(self._start, range(size)):
+                self._idle.put(shell)
+
+    def _start(self, slot: int) -> DockerShell:
+        name = f"{self.name_prefix}_{slot}"
+        try:
+            # Never hand out a container left over from a previous run
+            self.client.containers.get(name).remove(force=True)
+        except docker.errors.NotFound:
+            pass
+        shell = DockerShell(container_name=name, image=self.image, workdir=self.workdir)
+        with self._lock:
+            self._uses[name] = 0
+        return shell
+
+    def acquire(self, timeout: float | None = None) -> DockerShell:
+        """Lease an idle shell, waiting up to *timeout* seconds for one to be released."""
+        started = time.perf_counter()
+        try:
+            shell = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No container available in the pool after {timeout}s") from None
+        waited = time.perf_counter() - started
+
+        with self._lock:
+            self._leased += 1
+            self._leases += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._uses[shell.container_name] += 1
+        return shell
+
+    def release(self, shell: DockerShell):
+        """Return a leased shell, resetting or recycling its container."""
+        with self._lock:
+            self._leased -= 1
+            uses = self._uses.get(shell.container_name, 0)
+        if self._closed:
+            self._discard(shell)
+            return
+
+        recycle = self.recycle or (self.max_uses is not None and uses >= self.max_uses)
+        # Both take a Docker round-trip or more: keep them off the caller's path
+        threading.Thread(target=self._replace if recycle else self._scrub, args=(shell,), daemon=True).start()
+
+    def _scrub(self, shell: DockerShell):
+        try:
+            shell.reset(self.vault_root)
+        except (RuntimeError, docker.errors.DockerException) as e:
+            print(f"[ContainerPool] {e} - replacing it")
+            self._replace(shell)
+            return
+        self._return(shell)
+
+    def _replace(self, shell: DockerShell):
+        shell.close()
+        slot = int(shell.container_name.rsplit("_", 1)[1])
+        try:
+            fresh = self._start(slot)
+        except docker.errors.DockerException as e:
+            print(f"[ContainerPool] Could not recycle '{shell.container_name}': {e}")
+            try:
+                shell.reset(self.vault_root)
+            except (RuntimeError, docker.errors.DockerException):
+                # Neither scrubbed nor replaced: never handed out again
+                self._discard(shell)
+                return
+            fresh = shell
+        else:
+            with self._lock:
+                self._recycled += 1
+        self._return(fresh)
+
+    def _return(self, shell: DockerShell):
+        """Put *shell* back in the idle queue, or remove it when the pool was closed meanwhile."""
+        with self._lock:
+            if not self._closed:
+                self._idle.put(shell)
+                return
+        self._discard(shell)
+
+    @contextmanager
+    def lease(self, timeout: float | None = None):
+        shell = self.acquire(timeout)
+        try:
+            yield shell
+        finally:
+            self.release(shell)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "leased": self._leased,
+                "leases": self._leases,
+                "recycled": self._recycled,
+                "avg_wait": self._wait_total / self._leases if self._leases else 0.0,
+                "max_wait": self._wait_max,
+            }
+
+    def close(self):
+        """Remove every idle container; leased ones (and ones being reset) are removed when they come back."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                shell = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(shell)
+
+    @staticmethod
+    def _discard(shell: DockerShell):
+        shell.close()
+        try:
+            shell.container.remove(force=True)
+        except docker.errors.DockerException:
+            pass
@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+_WARMUP_HTML = "<html><head><title>warm</title></head><body><article><p>warm up</p></article></body></html>"
+
+
+def _warm_worker():
+    """Import the parsing stack once per worker so the first real task doesn't pay for it."""
+    import lxml.html  # noqa: F401
+    import trafilatura
+
+    trafilatura.bare_extraction(_WARMUP_HTML, with_metadata=True)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class ExtractionPool:
+    """
+    Process pool for CPU-bound parsing (trafilatura / lxml), so several pages can be
+    extracted at once without serializing on the GIL.
+
+    At most *max_pending* tasks are queued or running; when the pool is saturated,
+    run() degrades to extracting in the calling thread instead of queueing more.
+    Each task gets *task_timeout* seconds before run() gives up with TimeoutError.
+    """
+
+    def __init__(self, workers: int | None = None, max_pending: int | None = None, task_timeout: float = 20.0):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending or 2 * self.workers
+        self.task_timeout = task_timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._restart_lock = threading.Lock()
+        self.stats = {"pooled": 0, "in_process": 0, "timeouts": 0, "failures": 0, "restarts": 0}
+        self._executor = self._start()
+
+    def _start(self) -> ProcessPoolExecutor:
+        # fork: workers must not re-import the caller's __main__ (gemini_test starts a DockerShell at import)
+        context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_warm_worker)
+        # Spawn and warm every worker now rather than on the first real page
+        for future in [executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Replace *broken* once, however many threads saw it break."""
+        with self._restart_lock:
+            if self._executor is not broken:
+                return  # another thread already restarted it
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._start()
+        self._count("restarts")
+
+    def run(self, func, *args):
+        """Run func(*args) in a worker (or in-process when the pool is saturated or broken)."""
+        if not self._slots.acquire(blocking=False):
+            self._count("in_process")
+            return func(*args)
+
+        executor = self._executor
+        try:
+            future = executor.submit(func, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._count("failures")
+            self._restart(executor)
+            return func(*args)
+        # The slot is only freed when the worker is actually done, even after a timeout
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            result = future.result(timeout=self.task_timeout)
+        except FutureTimeout:
+            self._count("timeouts")
+            raise TimeoutError(f"Extraction took longer than {self.task_timeout}s") from None
+        except BrokenProcessPool:
+            self._count("failures")
+            self._restart(executor)
+            return func(*args)
+        self._count("pooled")
+        return result
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,23 +1,60 @@
 import json
-import requests
-import dotenv
 import os
-from google import genai
-from google.genai import types
 
-from scraper import universal_scraper
+import tools
+import llm_client
+from llm_client import MODEL, gateway, llm_cache
+from scraper import set_extraction_pool
 from container import DockerShell
+from extraction_pool import ExtractionPool
+from session_context import SessionContext
+from plan_executor import PlanExecutor
+from vault_links import VaultLinkIndex
+from vault_search import VaultSearchIndex
+from vault_vectors import VaultVectorIndex
 import docker
-dotenv.load_dotenv()
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
 # --- Tool list in XML for prompt clarity ---
 machine = DockerShell()
+# get_tree() on the vault is served from an incrementally refreshed index
+tree_index = machine.enable_tree_index("/opt/FMHY-RAG")
+# Titles, aliases, links and tags of the notes, updated from the tree index's changes
+link_index = VaultLinkIndex(tree_index)
+# Full-text index of the knowledge notes: Search answers from the vault before going to the web
+vault_index = VaultSearchIndex(tree_index, os.getenv("VAULT_INDEX_PATH", ".cache/vault_search.idx"))
+VAULT_SEARCH_THRESHOLD = float(os.getenv("VAULT_SEARCH_THRESHOLD", "0.4"))
+# Embeddings of note chunks, to show the model the few notes related to a request
+vector_index = VaultVectorIndex(tree_index, os.getenv("VAULT_VECTORS_PATH", ".cache/vault_vectors"))
+# Parse scraped pages in worker processes so parallel scrapes don't serialize on the GIL
+set_extraction_pool(ExtractionPool())
+tools.set_docker_shell(machine)
 
 
 
 
-def llm(question: str):
+def _strip_fences(response_text: str) -> str:
+    response_text = response_text.strip()
+
+    # Remove common markdown artifacts
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    if response_text.startswith("```"):
+        response_text = response_text[3:]
+
+    return response_text.strip()
+
+
+def _is_tool_call(response_text: str) -> bool:
+    try:
+        json.loads(_strip_fences(response_text))
+    except json.JSONDecodeError:
+        return False
+    return True
+
+
+def llm(question: str, use_cache: bool = True):
     tools = """
     <system>
       <identity>
@@ -148,25 +185,11 @@ def llm(question: str):
     """
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            config=types.GenerateContentConfig(
-                system_instruction=system_prompt),
-            contents=question
-        )
+        response_text = llm_cache.generate(gateway, MODEL, system_prompt, question,
+                                           use_cache=use_cache, accept=_is_tool_call)
 
         # Clean the response text
-        response_text = response.text.strip()
-
-        # Remove common markdown artifacts
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-
-        response_text = response_text.strip()
+        response_text = _strip_fences(response_text)
 
         # Try to parse the JSON
         parsed = json.loads(response_text)
@@ -184,21 +207,25 @@ def llm(question: str):
                 }
             }
         }
-    except Exception as e:
-        # For any other error, also fall back to Search
-        print(f"Unexpected error, falling back to Search for: {question}")
-        return {
-            "tool": {
-                "name": "Search",
-                "parameters": {
-                    "query": question
-                }
-            }
-        }
 
-def the_planner(question: str):
+def relevant_notes(text: str, k: int = 5) -> str:
+    """The *k* notes closest in meaning to *text*, one line each, for a prompt."""
+    hits = vector_index.search(text, k)
+    return "\n".join(f"- {hit.title} ({hit.path}): {hit.snippet}" for hit in hits) or "(no related notes)"
 
 
+def _is_plan(unformated: str) -> bool:
+    try:
+        json.loads(unformated[7:-4])
+    except json.decoder.JSONDecodeError:
+        return False
+    return True
+
+
+def the_planner(question: str, use_cache: bool = True):
+    tree_index.refresh()  # also brings the link, search and vector indexes up to date
+    related = relevant_notes(question)
+
     system_prompt = f"""
 <system>
   <identity>
@@ -237,6 +264,11 @@ def the_planner(question: str):
         </layout>
       </item>
     </system_knowledge>
+    <relevantNotes>
+      Existing notes closest to the request (path: excerpt). Prefer linking or
+      updating these over creating duplicates.
+      {related}
+    </relevantNotes>
   </context>
 
   <!-- ─────────── Runtime behaviour ─────────── -->
@@ -335,165 +367,22 @@ def the_planner(question: str):
 
 
     """
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        config=types.GenerateContentConfig(
-            system_instruction=system_prompt),
-        contents=question
-    )
-    unformated = response.text
+    unformated = llm_cache.generate(gateway, MODEL, system_prompt, question, use_cache=use_cache,
+                                    accept=_is_plan)
     try:
         formater = json.loads(unformated[7:-4])
         return formater
     except json.decoder.JSONDecodeError:
         return "formated wrong"
 
-def llm_summarize(content: str) -> str:
-    """Summarize arbitrary content into a single, well‑structured Obsidian note.
-
-    The generated note follows a Zettelkasten‑friendly template and *only* links to
-    notes that already exist in the vault at /opt/FMHY‑RAG.
-    """
-
-    # 1) Inspect the current vault so the model knows which links are valid
-    vault_tree = machine.get_tree("/opt/FMHY-RAG")
+def llm_summarize(content: str, use_cache: bool = True) -> str:
+    """Summarize *content* into one Obsidian note, linking only to existing, related notes."""
+    tree_index.refresh()  # also brings the link, search and vector indexes up to date
+    return llm_client.llm_summarize(content, use_cache,
+                                    allowed_titles=link_index.relevant_titles(content, limit=20),
+                                    related=relevant_notes(content))
 
 
-    # 2) System prompt with strict formatting + link‑validation rule
-    system_instruction_summary = f"""
-    <system>
-      <identity>
-        <role>content-synthesizer</role>
-        <description>
-          You are an expert content synthesizer who converts arbitrary text into a
-          single, atomic Obsidian Markdown note that follows Zettelkasten principles.
-        </description>
-        <capabilities>
-          <reasoning>true</reasoning>
-          <multiStep>false</multiStep>
-          <toolUse>false</toolUse>
-        </capabilities>
-      </identity>
-
-      <behavior>
-        <onUserMessage>
-          <step>1. Parse the user-provided content.</step>
-          <step>2. Produce ONE complete Markdown note with the structure below.</step>
-          <step>3. When creating links, <strong>only</strong> link to the filenames listed in the
-                  “Allowed note titles” block (case-sensitive, no “.md” extension).
-                  Do <strong>not</strong> link to folders or any other names.</step>
-          <step>4. Respond with nothing except the finished Markdown note.</step>
-        </onUserMessage>
-      </behavior>
-
-      <!-- ──────────────────────────────────────────────────────────────── -->
-      <!--              Obsidian Note Structure Requirements               -->
-      <!-- ──────────────────────────────────────────────────────────────── -->
-      <instructions>
-        You must follow this template:
-
-        1. <strong>Title</strong> – PascalCase or kebab-case, prefixed with an emoji
-           (e.g., <code># 📌 Python-Decorators</code>).
-        2. <strong>Summary</strong> – one concise paragraph.
-        3. <strong>Key Points</strong> – bulleted list of core ideas.
-        4. <strong>Examples</strong> – fenced code blocks where relevant.
-        5. <strong>Links</strong> – only <code>[[WikiLinks]]</code> to allowed note titles.
-        6. <strong>Tags</strong> – relevant <code>#hashtags</code>.
-      </instructions>
-
-      <!-- ──────────────────────────────────────────────────────────────── -->
-      <!--           Allowed note titles (link whitelist)                  -->
-      <!-- ──────────────────────────────────────────────────────────────── -->
-      <allowedNoteTitles>
-        templates
-        note
-        Cat
-        Blocking-Bypassing-Captchas-reCAPTCHAs
-        project
-        journal
-        CodingSession
-        knowledge
-        Solving-Amazon-Flex-Captcha-Issues
-        home
-      </allowedNoteTitles>
-
-      <!-- Full vault tree shown for reference; do not link to folders. -->
-      <vaultTree>
-    |--- 05_Templates
-    |   |--- templates.md
-    |--- .obsidian
-    |   |--- app.json
-    |--- 03_Notes
-    |   |--- note.md
-    |   |--- Cat.md
-    |   |--- Blocking-Bypassing-Captchas-reCAPTCHAs.md
-    |--- 01_Projects
-    |   |--- project.md
-    |--- 04_Journal
-    |   |--- journal.md
-    |   |--- CodingSession.md
-    |--- 02_Knowledge
-    |   |--- knowledge.md
-    |   |--- Web-Scraping
-    |   |--- Animals
-    |   |--- LinuxCommands
-    |   |--- Development
-    |   |--- Solving-Amazon-Flex-Captcha-Issues.md
-    |   |--- Dinosaurs
-    |   |--- Paleontology
-    |   |--- Biology
-    |--- 00_Home
-    |   |--- home.md
-      </vaultTree>
-
-      <!-- ──────────────────────────────────────────────────────────────── -->
-      <!--                     Example output format                       -->
-      <!-- ──────────────────────────────────────────────────────────────── -->
-      <example>
-    ```markdown
-    # 📌 Decorators-in-Python
-
-    ## Summary
-    A decorator is a function that modifies the behaviour of another function without permanently changing it.
-
-    ## Key Points
-    - Uses the `@` syntax for simple application.
-    - Multiple decorators can be stacked.
-    - Typical use-cases: logging, timing, access control.
-
-    ## Example
-    ```python
-    @my_decorator
-    def say_hello():
-        print("Hello, world!")
-    Links
-    [[Functions-in-Python]]
-    [[Closures-and-Scope]]
-
-    Tags
-    #python #programming #decorators
-
-    pgsql
-    Copy
-    Edit
-      </example>
-
-      <finalTask>
-        Analyse the content supplied by the user and output ONE complete Markdown
-        note that obeys all rules above. Do <strong>not</strong> wrap your answer in XML—return
-        only the Markdown.
-      </finalTask>
-    </system>
-    """
-
-    # 3) Call Gemini with the enhanced system instruction
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        config=types.GenerateContentConfig(system_instruction=system_instruction_summary),
-        contents=content,
-    )
-
-    return response.text
 # --- Tool executor ---
 def execute_tool(parsed):
 
@@ -503,21 +392,33 @@ def execute_tool(parsed):
     tool_name = tool["name"]
     params = tool["parameters"]
 
-    if tool_name == "Search":
-        # Get Search results using controller
-        base_url = "http://127.0.0.1:8000/"
-        full_url = f"{base_url}{parsed["tool"]["name"]}?question={parsed["tool"]["parameters"]["query"]}"
-
-        response = requests.get(full_url)
+    if tool_name not in tools.registry:
+        return f"Error: Unknown tool name '{tool_name}'."
+    try:
+        return run_tool(tool_name, params)
+    except TimeoutError as e:
+        return f"❌ {e}"
 
-        links = response.json()
 
-        # Use the first Search result's URL
+def run_tool(tool_name, params):
+    if tool_name == "Search":
+        # A confident match among the existing notes beats a web search + scrape + summary
+        vault_index.sync()
+        hits = vault_index.search(params["query"])
+        if hits and hits[0].confidence >= VAULT_SEARCH_THRESHOLD:
+            found = "\n\n".join(f"- {hit.path} (score {hit.confidence:.2f})\n  {hit.snippet}" for hit in hits
+                                 if hit.confidence >= VAULT_SEARCH_THRESHOLD / 2)
+            return f"📚 Already in the vault for '{params['query']}':\n{found}"
 
-        link_test = links["searched"][0]["url"]
+        # Search and scrape run in-process (SEARCH_TRANSPORT=http goes through theapi instead)
+        links = tools.registry.call("Search", params)
 
-        # Scrape content from the URL
-        content = universal_scraper(link_test)
+        # Scrape the top results in parallel and keep the first two good pages
+        urls = [item["url"] for item in links]
+        pages = tools.registry.call("scrape", {"urls": urls, "want": 2})
+        if not pages:
+            return f"❌ Could not extract content from any search result for '{params['query']}'."
+        content = "\n\n---\n\n".join(pages)
 
 
         # Summarize the content using LLM
@@ -535,7 +436,7 @@ def execute_tool(parsed):
 
 
         # Execute the Docker command
-        result = machine.run_command(command)
+        result = tools.registry.call("execute_docker_command", params)
         print("Command output:", result)
 
         # Get tree structure of /opt/FMHY-RAG
@@ -546,24 +447,31 @@ def execute_tool(parsed):
             f"📁 Tree of THE OBSIDIAN VAULT IN /opt/FMHY-RAG:\n{tree_output}"
         )
     else:
-        return f"Error: Unknown tool name '{tool_name}'."
+        return f"Error: Tool '{tool_name}' cannot be called directly by the agent."
 
 
 if __name__ == '__main__':
+    # Independent plan steps run side by side; tool limits still come from the registry
+    executor = PlanExecutor(llm, execute_tool, max_workers=int(os.getenv("PLAN_WORKERS", "4")))
     while True:
-        session_history = ""  # Accumulate session context across turns
+        # Session context across turns, compacted to stay under the token budget
+        session = SessionContext(budget=int(os.getenv("SESSION_TOKEN_BUDGET", "6000")))
         current_path = machine.get_current_path()
         info = f"User is at path: {current_path}\n"
         question = input(f"{current_path}: ")
         steps = the_planner(question)
+        if not isinstance(steps, dict) or "plan" not in steps:
+            print("❌ The planner did not return a usable plan.")
+            continue
         for i,step in enumerate(steps["plan"]):
             print(i,step)
 
-        for i,step in enumerate(steps["plan"]):
-            step_llm = str(step)
-            context_prompt = session_history + info + question
-            parsed = llm(context_prompt)
-            result = execute_tool(parsed)
+        def show(result):
             print("--------------------------")
-            print(i,result)
-            session_history += f"\n> {question}\n{result}\n"
+            print(result.index, f"({result.duration:.1f}s, after {result.depends_on or 'nothing'})", result.output)
+
+        results = executor.run(question, steps["plan"], session, info, on_result=show)
+        print("⏱️ " + ", ".join(f"step {r.index}: llm {r.select_time:.1f}s + tool {r.tool_time:.1f}s" for r in results))
+        cache = machine.command_cache.stats()
+        print(f"🗂️ Command cache: {cache['hits']} hits, {cache['misses']} misses, "
+              f"{cache['invalidations']} invalidations (vault generation {cache['generation']})")
@@ -0,0 +1,180 @@
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, NamedTuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from sqlite_lru import SqliteLruStore
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical cache key: lowercase scheme/host, no default port, no fragment, sorted query."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    status: int
+    headers: dict
+    body: bytes
+    encoding: str | None
+    fetched_at: float
+    decoded: str | None = None  # set when the downloader already decoded the body
+    truncated_at: int | None = None  # byte budget the body was cut at; None when complete
+
+    def covers(self, max_bytes: int | None) -> bool:
+        """Whether this body is all a download capped at *max_bytes* (None: uncapped) would get."""
+        return self.truncated_at is None or (max_bytes is not None and max_bytes <= self.truncated_at)
+
+    @property
+    def text(self) -> str:
+        if self.decoded is not None:
+            return self.decoded
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+
+class Download(NamedTuple):
+    """What a downloader hands to the cache: the response (status/headers) and its body."""
+    response: requests.Response
+    body: bytes
+    encoding: str | None
+    text: str | None = None
+    truncated_at: int | None = None  # set when the body stopped at the download budget
+
+
+def plain_download(http: requests.Session, url: str, headers: dict, timeout: float) -> Download:
+    response = http.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        return Download(response, b"", None)
+    response.raise_for_status()
+    return Download(response, response.content, response.encoding or response.apparent_encoding)
+
+
+class HttpCache:
+    """
+    Persistent HTTP response cache (SQLite) keyed by normalized URL.
+
+    Entries younger than *ttl* seconds are served without touching the network.
+    Older ones are revalidated with If-None-Match / If-Modified-Since, so an
+    unchanged page costs a 304 instead of a full download. The total body size
+    is kept under *max_bytes* by evicting the least recently used entries.
+
+    A body cut at a download budget is stored with that budget and only served
+    to fetches with the same or a smaller one; a larger budget downloads again.
+    """
+
+    def __init__(self, path: str = ".cache/http_cache.sqlite3", ttl: float = 6 * 3600,
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()  # counters: fetch runs on many scraper threads
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._store = SqliteLruStore(
+            path,
+            {"status": "INTEGER", "headers": "TEXT", "body": "BLOB", "encoding": "TEXT", "etag": "TEXT",
+             "last_modified": "TEXT", "fetched_at": "REAL", "truncated_at": "INTEGER"},
+            max_bytes,
+            key_column="url",
+        )
+
+    def get(self, url: str) -> tuple[CachedResponse, str | None, str | None] | None:
+        """Return (response, etag, last_modified) for *url*, or None if it isn't cached."""
+        row = self._store.get(normalize_url(url))
+        if row is None:
+            return None
+        status, headers, body, encoding, etag, last_modified, fetched_at, truncated_at = row
+        response = CachedResponse(url, status, json.loads(headers), body, encoding, fetched_at,
+                                  truncated_at=truncated_at)
+        return response, etag, last_modified
+
+    def put(self, url: str, download: Download) -> CachedResponse:
+        """Store a fresh 200 response (unless it says no-store) and return its cached form."""
+        response, body, encoding, text, truncated_at = download
+        cached = CachedResponse(url, response.status_code, dict(response.headers), body, encoding, time.time(), text,
+                                truncated_at)
+        if "no-store" in response.headers.get("Cache-Control", ""):
+            return cached
+
+        self._store.put(
+            normalize_url(url),
+            {
+                "status": cached.status, "headers": json.dumps(cached.headers), "body": body, "encoding": encoding,
+                "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": cached.fetched_at, "truncated_at": truncated_at,
+            },
+            len(body),
+        )
+        return cached
+
+    def _touch(self, url: str) -> float:
+        now = time.time()
+        self._store.update(normalize_url(url), fetched_at=now)
+        return now
+
+    def fetch(self, http: requests.Session, url: str, timeout: float = 10,
+              download: Callable[..., Download] = plain_download, max_bytes: int | None = None) -> CachedResponse:
+        """
+        GET *url* through the cache. *download(http, url, headers, timeout)* performs the
+        network request (e.g. a streaming, size-capped one) and raises requests exceptions
+        like a plain GET would. *max_bytes* is the budget that downloader reads up to: a
+        copy cut at a smaller budget is not served, nor revalidated, but downloaded again.
+
+        Raises:
+            requests.HTTPError: for a 304 when there is no cached copy to revalidate.
+        """
+        cached = self.get(url)
+        if cached is not None and not cached[0].covers(max_bytes):
+            cached = None
+        headers = {}
+        if cached is not None:
+            response, etag, last_modified = cached
+            if time.time() - response.fetched_at < self.ttl:
+                with self._lock:
+                    self.hits += 1
+                return response
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        fresh = download(http, url, headers, timeout)
+        if fresh.response.status_code == 304:
+            if cached is None:
+                # Nothing to revalidate: caching it would serve an empty page for the whole TTL
+                raise requests.HTTPError(f"304 Not Modified for {url} without a cached copy",
+                                         response=fresh.response)
+            with self._lock:
+                self.revalidated += 1
+            response.fetched_at = self._touch(url)
+            return response
+
+        with self._lock:
+            self.misses += 1
+        return self.put(url, fresh)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, revalidated, misses = self.hits, self.revalidated, self.misses
+        lookups = hits + revalidated + misses
+        return {
+            "hits": hits,
+            "revalidated": revalidated,
+            "misses": misses,
+            "hit_rate": (hits + revalidated) / lookups if lookups else 0.0,
+            **self._store.stats(),
+        }
@@ -0,0 +1,104 @@
+import hashlib
+import threading
+import time
+from typing import Callable
+
+from sqlite_lru import SqliteLruStore
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LlmCache:
+    """
+    Persistent cache (SQLite) of model responses, keyed on the model name, the
+    system instruction and the contents. The huge system prompts are hashed
+    separately so the key stays small.
+
+    The total stored text is kept under *max_bytes* by evicting the least recently
+    used entries. Every entry remembers how long the original call took, which is
+    what a hit saves.
+    """
+
+    def __init__(self, path: str = ".cache/llm_cache.sqlite3", max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.latency_saved = 0.0
+        self._store = SqliteLruStore(
+            path,
+            {"model": "TEXT", "text": "TEXT", "latency": "REAL", "created_at": "REAL"},
+            max_bytes,
+        )
+
+    @staticmethod
+    def key(model: str, system_instruction: str, contents: str) -> str:
+        return _digest(f"{model}\0{_digest(system_instruction)}\0{_digest(contents)}")
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        """Return (text, original latency) for *key*, or None if it isn't cached."""
+        return self._store.get(key, ["text", "latency"])
+
+    def put(self, key: str, model: str, text: str, latency: float):
+        self._store.put(key, {"model": model, "text": text, "latency": latency, "created_at": time.time()},
+                        len(text.encode("utf-8")))
+
+    def generate(self, client, model: str, system_instruction: str, contents: str, use_cache: bool = True,
+                 accept: Callable[[str], bool] | None = None) -> str:
+        """
+        Return the text of client.models.generate_content(...), from the cache when possible.
+
+        Args:
+            client: Anything exposing `.models.generate_content` (a genai.Client or a stub).
+            model: Model name, part of the cache key.
+            system_instruction: System prompt, part of the cache key.
+            contents: User contents, part of the cache key.
+            use_cache: False forces a fresh call (the result still refreshes the cache).
+            accept: Only answers for which accept(text) is true are cached, so a
+                malformed answer (e.g. unparseable JSON) gets retried next time.
+
+        Returns:
+            str: The response text.
+        """
+        key = self.key(model, system_instruction, contents)
+        if use_cache:
+            cached = self.get(key)
+            if cached is not None:
+                text, latency = cached
+                with self._lock:
+                    self.hits += 1
+                    self.latency_saved += latency
+                return text
+
+        started = time.perf_counter()
+        response = client.models.generate_content(
+            model=model,
+            config={"system_instruction": system_instruction},
+            contents=contents,
+        )
+        latency = time.perf_counter() - started
+        with self._lock:
+            if use_cache:
+                self.misses += 1
+            else:
+                self.bypassed += 1
+
+        text = response.text
+        if text and (accept is None or accept(text)):  # blocked / empty answers are not worth replaying
+            self.put(key, model, text, latency)
+        return text
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "latency_saved": self.latency_saved,
+            **self._store.stats(),
+        }
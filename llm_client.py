@@ -0,0 +1,132 @@
+import os
+
+import dotenv
+from google import genai
+
+from llm_cache import LlmCache
+from llm_gateway import LlmGateway
+
+dotenv.load_dotenv()
+client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+MODEL = "gemini-2.0-flash"
+# Every model call is rate limited, bounded in flight, retried on transient errors and has a deadline
+gateway = LlmGateway(
+    client,
+    rate=float(os.getenv("LLM_RATE", "1")),
+    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "4")),
+    deadline=float(os.getenv("LLM_DEADLINE", "60")),
+)
+# Identical prompts (re-asked questions, re-run plans, re-scraped pages) are answered from disk
+llm_cache = LlmCache(os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3"))
+
+
+def llm_summarize(content: str, use_cache: bool = True, allowed_titles: list[str] | None = None,
+                  related: str = "(no related notes)") -> str:
+    """Summarize arbitrary content into a single, well‑structured Obsidian note.
+
+    The generated note follows a Zettelkasten‑friendly template and *only* links to
+    the *allowed_titles* (notes that already exist in the vault at /opt/FMHY‑RAG);
+    without any, it adds no links. *related* lists the closest existing notes, for
+    context only. Importing this module boots no container and no vault index, so
+    the API can summarize without the CLI's machinery.
+    """
+
+    # 1) Only offer link targets that exist and relate to the content
+    allowed_titles = "\n        ".join(allowed_titles or []) or "(none - do not add links)"
+
+    # 2) System prompt with strict formatting + link‑validation rule
+    system_instruction_summary = f"""
+    <system>
+      <identity>
+        <role>content-synthesizer</role>
+        <description>
+          You are an expert content synthesizer who converts arbitrary text into a
+          single, atomic Obsidian Markdown note that follows Zettelkasten principles.
+        </description>
+        <capabilities>
+          <reasoning>true</reasoning>
+          <multiStep>false</multiStep>
+          <toolUse>false</toolUse>
+        </capabilities>
+      </identity>
+
+      <behavior>
+        <onUserMessage>
+          <step>1. Parse the user-provided content.</step>
+          <step>2. Produce ONE complete Markdown note with the structure below.</step>
+          <step>3. When creating links, <strong>only</strong> link to the filenames listed in the
+                  “Allowed note titles” block (case-sensitive, no “.md” extension).
+                  Do <strong>not</strong> link to folders or any other names.</step>
+          <step>4. Respond with nothing except the finished Markdown note.</step>
+        </onUserMessage>
+      </behavior>
+
+      <!-- ──────────────────────────────────────────────────────────────── -->
+      <!--              Obsidian Note Structure Requirements               -->
+      <!-- ──────────────────────────────────────────────────────────────── -->
+      <instructions>
+        You must follow this template:
+
+        1. <strong>Title</strong> – PascalCase or kebab-case, prefixed with an emoji
+           (e.g., <code># 📌 Python-Decorators</code>).
+        2. <strong>Summary</strong> – one concise paragraph.
+        3. <strong>Key Points</strong> – bulleted list of core ideas.
+        4. <strong>Examples</strong> – fenced code blocks where relevant.
+        5. <strong>Links</strong> – only <code>[[WikiLinks]]</code> to allowed note titles.
+        6. <strong>Tags</strong> – relevant <code>#hashtags</code>.
+      </instructions>
+
+      <!-- ──────────────────────────────────────────────────────────────── -->
+      <!--           Allowed note titles (link whitelist)                  -->
+      <!-- ──────────────────────────────────────────────────────────────── -->
+      <allowedNoteTitles>
+        {allowed_titles}
+      </allowedNoteTitles>
+
+      <!-- Closest existing notes by meaning, for context only (path: excerpt). -->
+      <relevantNotes>
+        {related}
+      </relevantNotes>
+
+      <!-- ──────────────────────────────────────────────────────────────── -->
+      <!--                     Example output format                       -->
+      <!-- ──────────────────────────────────────────────────────────────── -->
+      <example>
+    ```markdown
+    # 📌 Decorators-in-Python
+
+    ## Summary
+    A decorator is a function that modifies the behaviour of another function without permanently changing it.
+
+    ## Key Points
+    - Uses the `@` syntax for simple application.
+    - Multiple decorators can be stacked.
+    - Typical use-cases: logging, timing, access control.
+
+    ## Example
+    ```python
+    @my_decorator
+    def say_hello():
+        print("Hello, world!")
+    Links
+    [[Functions-in-Python]]
+    [[Closures-and-Scope]]
+
+    Tags
+    #python #programming #decorators
+
+    pgsql
+    Copy
+    Edit
+      </example>
+
+      <finalTask>
+        Analyse the content supplied by the user and output ONE complete Markdown
+        note that obeys all rules above. Do <strong>not</strong> wrap your answer in XML—return
+        only the Markdown.
+      </finalTask>
+    </system>
+    """
+
+    # 3) Call Gemini with the enhanced system instruction
+    return llm_cache.generate(gateway, MODEL, system_instruction_summary, content, use_cache=use_cache)
@@ -0,0 +1,194 @@
+import asyncio
+import bisect
+import random
+import threading
+import time
+
+import httpx
+
+# Status codes worth retrying: timeouts, rate limiting and server-side hiccups
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError, ConnectionError)):
+        return True
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return status in TRANSIENT_STATUS
+
+
+class TokenBucket:
+    """Allows *rate* requests per second on average, with bursts of up to *burst*."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns the time waited."""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+
+class LatencyHistogram:
+    BOUNDS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+            self.total += seconds
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (inf past the last bound)."""
+        with self._lock:
+            rank = q * self.count
+            seen = 0
+            for bound, count in zip(self.BOUNDS + (float("inf"),), self.counts):
+                seen += count
+                if count and seen >= rank:
+                    return bound
+        return 0.0
+
+    def snapshot(self) -> dict:
+        labels = [f"<={bound}s" for bound in self.BOUNDS] + [f">{self.BOUNDS[-1]}s"]
+        with self._lock:
+            buckets = dict(zip(labels, self.counts))
+            avg = self.total / self.count if self.count else 0.0
+        return {"buckets": buckets, "avg": avg, "p50": self.quantile(0.5), "p95": self.quantile(0.95)}
+
+
+class _SyncModels:
+    """`gateway.models.generate_content(...)`, so the gateway can stand in for a genai client."""
+
+    def __init__(self, gateway: "LlmGateway"):
+        self._gateway = gateway
+
+    def generate_content(self, model: str, config, contents, deadline: float | None = None):
+        return self._gateway.run(self._gateway.generate_content(model, config, contents, deadline))
+
+
+class LlmGateway:
+    """
+    Shared entry point for model calls. Every call goes through a token-bucket rate
+    limiter and a max-in-flight semaphore, gets a deadline, and transient failures
+    (429, 5xx, timeouts, dropped connections) are retried with full-jitter
+    exponential backoff while the deadline allows it.
+
+    Uses `client.aio` when the client has it, otherwise runs the blocking
+    `client.models.generate_content` in a thread. Synchronous code calls through
+    `gateway.models.generate_content`, which runs on the gateway's own event loop;
+    async callers must all share a single event loop.
+    """
+
+    def __init__(self, client, rate: float = 1.0, burst: int = 4, max_in_flight: int = 4,
+                 retries: int = 3, backoff: float = 0.5, max_backoff: float = 8.0, deadline: float = 60.0):
+        self.client = client
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.bucket = TokenBucket(rate, burst)
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.latency = LatencyHistogram()
+        self.models = _SyncModels(self)
+        self._lock = threading.Lock()
+        self.stats_counts = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0, "deadline_exceeded": 0}
+        self.throttled_time = 0.0
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats_counts[key] += amount
+
+    async def _attempt(self, model: str, config, contents):
+        aio = getattr(self.client, "aio", None)
+        if aio is not None:
+            return await aio.models.generate_content(model=model, config=config, contents=contents)
+        return await asyncio.to_thread(self.client.models.generate_content, model=model, config=config,
+                                       contents=contents)
+
+    async def generate_content(self, model: str, config, contents, deadline: float | None = None):
+        """
+        Call the model and return its raw response.
+
+        Raises:
+            TimeoutError: No answer within *deadline* seconds (retries included).
+            Exception: The last error, once it isn't transient or retries are exhausted.
+        """
+        deadline = deadline or self.deadline
+        expires = time.monotonic() + deadline
+        self._count("calls")
+        started = time.perf_counter()
+        attempt = 0
+        try:
+            async with self._semaphore:
+                while True:
+                    self.throttled_time += await self.bucket.acquire()
+                    remaining = expires - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"Model call exceeded its {deadline}s deadline")
+                    self._count("attempts")
+                    try:
+                        response = await asyncio.wait_for(self._attempt(model, config, contents), remaining)
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f"Model call exceeded its {deadline}s deadline") from None
+                    except Exception as e:
+                        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                        if not is_transient(e) or attempt >= self.retries or time.monotonic() + delay >= expires:
+                            raise
+                        attempt += 1
+                        self._count("retries")
+                        print(f"[LLM Gateway] {type(e).__name__}: {e} - retry {attempt} in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+                        continue
+                    self.latency.observe(time.perf_counter() - started)
+                    return response
+        except TimeoutError:
+            self._count("deadline_exceeded")
+            raise
+        except Exception:
+            self._count("failures")
+            raise
+
+    # --- sync facade ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-gateway", daemon=True).start()
+            return self._loop
+
+    def run(self, coroutine):
+        """Run *coroutine* on the gateway loop from synchronous code and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop()).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.stats_counts)
+        return {**counts, "throttled_time": self.throttled_time, "latency": self.latency.snapshot()}
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
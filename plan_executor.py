@@ -0,0 +1,165 @@
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable
+
+from container import is_mutating_command
+from session_context import SessionContext
+
+# Step wording that changes the vault (or the shell's cwd)
+_MUTATING_WORDS = re.compile(
+    r"\b(create|write|delete|remove|rm|move|mv|rename|append|update|edit|modify|mkdir|touch|copy|cp|"
+    r"save|archive|add|insert|replace|cd)\b",
+    re.IGNORECASE,
+)
+# Step wording that refers to the outcome of an earlier step
+_REFERS_BACK = re.compile(
+    r"\b(previous|earlier|above|found|discovered|result|results|output|then|step\s*\d+)\b",
+    re.IGNORECASE,
+)
+_DEPENDENCY_KEYS = ("depends_on", "dependencies", "requires", "after")
+
+
+@dataclass
+class StepResult:
+    index: int
+    step: object
+    depends_on: list[int]
+    parsed: dict | None = None
+    output: str = ""
+    started: float = 0.0      # seconds since the plan started
+    finished: float = 0.0
+    select_time: float = 0.0  # tool-selection LLM call
+    tool_time: float = 0.0
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+
+def step_text(step) -> str:
+    if isinstance(step, dict):
+        for key in ("description", "step_description", "action", "task", "details"):
+            if isinstance(step.get(key), str):
+                return step[key]
+    return str(step)
+
+
+def is_mutating_step(step) -> bool:
+    """Guess whether *step* writes to the vault. Unknown docker commands count as writes."""
+    if isinstance(step, dict):
+        command = step.get("command") or (step.get("parameters") or {}).get("command")
+        if isinstance(command, str):
+            return is_mutating_command(command)
+        tool = step.get("tool")
+        if isinstance(tool, dict):
+            tool = tool.get("name")
+        if tool == "Search":
+            return False
+    return bool(_MUTATING_WORDS.search(step_text(step)))
+
+
+def declared_dependencies(steps: list) -> list[list[int] | None]:
+    """Dependencies the planner spelled out (by step number or id), None where it didn't."""
+    ids = {}
+    for i, step in enumerate(steps):
+        step_id = step.get("step", step.get("id", i + 1)) if isinstance(step, dict) else i + 1
+        ids[str(step_id)] = i
+
+    declared = []
+    for i, step in enumerate(steps):
+        found = None
+        if isinstance(step, dict):
+            for key in _DEPENDENCY_KEYS:
+                if key in step:
+                    value = step[key]
+                    values = value if isinstance(value, list) else [value]
+                    found = sorted({ids[str(v)] for v in values if str(v) in ids and ids[str(v)] < i})
+                    break
+        declared.append(found)
+    return declared
+
+
+def plan_dependencies(steps: list) -> list[list[int]]:
+    """
+    Dependencies of every step: the declared ones when the planner gave them, otherwise
+    inferred. A write waits for everything before it, a read waits for earlier writes,
+    and a step that refers back to earlier results waits for all previous steps.
+    """
+    declared = declared_dependencies(steps)
+    mutating = [is_mutating_step(step) for step in steps]
+    dependencies = []
+    for i, step in enumerate(steps):
+        if declared[i] is not None:
+            dependencies.append(declared[i])
+        elif mutating[i] or _REFERS_BACK.search(step_text(step)):
+            dependencies.append(list(range(i)))
+        else:
+            dependencies.append([j for j in range(i) if mutating[j]])
+    return dependencies
+
+
+class PlanExecutor:
+    """
+    Runs a planner's steps on a bounded thread pool. Each step is fed to the
+    tool-selection LLM and its tool call executed as soon as the steps it depends
+    on are done, so independent steps (several Searches, a Search next to a `find`)
+    overlap instead of queueing.
+    """
+
+    def __init__(self, select_tool: Callable[[str], dict], run_tool: Callable[[dict], str], max_workers: int = 4):
+        self.select_tool = select_tool  # llm(): prompt -> tool call
+        self.run_tool = run_tool        # execute_tool(): tool call -> result text
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plan-step")
+
+    def _run_step(self, result: StepResult, prompt: str, plan_started: float) -> StepResult:
+        result.started = time.perf_counter() - plan_started
+        try:
+            result.parsed = self.select_tool(prompt)
+            result.select_time = time.perf_counter() - plan_started - result.started
+            result.output = self.run_tool(result.parsed)
+        except Exception as e:
+            result.output = f"❌ Step failed: {e}"
+        result.finished = time.perf_counter() - plan_started
+        result.tool_time = result.finished - result.started - result.select_time
+        return result
+
+    def run(self, question: str, steps: list, session: SessionContext, info: str = "",
+            on_result: Callable[[StepResult], None] | None = None) -> list[StepResult]:
+        """
+        Execute *steps*. Results are added to *session* as they complete, so a step
+        launched later sees the outcome of the steps it waited for.
+
+        Returns:
+            list[StepResult]: One result per step, in plan order.
+        """
+        plan_started = time.perf_counter()
+        dependencies = plan_dependencies(steps)
+        results = [StepResult(i, step, dependencies[i]) for i, step in enumerate(steps)]
+        waiting = set(range(len(steps)))
+        finished = set()
+        running = {}
+
+        while waiting or running:
+            for i in sorted(waiting):
+                if all(j in finished for j in dependencies[i]):
+                    waiting.discard(i)
+                    prompt = (
+                        session.render() + info
+                        + f"User request: {question}\nStep to perform now: {steps[i]}"
+                    )
+                    running[self._executor.submit(self._run_step, results[i], prompt, plan_started)] = i
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                finished.add(i)
+                session.add(step_text(steps[i]), results[i].output)
+                if on_result is not None:
+                    on_result(results[i])
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
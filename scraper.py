@@ -1,59 +1,177 @@
 import requests
 import trafilatura
-from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
 import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import time
+from requests.adapters import HTTPAdapter
+import os
+import hashlib
+import codecs
+from functools import partial
+import threading
+from collections import OrderedDict
 
+from http_cache import Download, HttpCache
 
-def _manual_fallback_scraper(html_content: str, url: str) -> str:
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Shared HTTP client: keeps connections alive across scrapes and concurrent fetches
+session = requests.Session()
+session.headers.update(HEADERS)
+session.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+# Download limits: only (X)HTML-ish content, at most MAX_DOWNLOAD_BYTES of it
+ACCEPTED_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain", "application/xml", "text/xml")
+MAX_DOWNLOAD_BYTES = 2 * 1024 * 1024
+MAX_CONTENT_LENGTH = 20 * 1024 * 1024
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.I)
+
+# Persistent response cache: re-researching a topic revalidates pages instead of re-downloading them
+http_cache = HttpCache(os.getenv("HTTP_CACHE_PATH", ".cache/http_cache.sqlite3"))
+
+_fetch_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="scraper")
+
+# Extraction results keyed by a hash of the HTML: mirrors, cache hits and re-fetches skip parsing
+EXTRACTION_CACHE_SIZE = 256
+_extraction_cache: OrderedDict[str, tuple[str, str] | None] = OrderedDict()
+_extraction_lock = threading.Lock()
+extraction_stats = {"hits": 0, "misses": 0}
+
+# Optional ExtractionPool: when set, parsing runs in worker processes instead of the caller's thread
+extraction_pool = None
+
+
+def set_extraction_pool(pool):
+    """Route extraction through *pool* (an ExtractionPool), or back in-process with None."""
+    global extraction_pool
+    extraction_pool = pool
+
+
+# Rules of the manual fallback scraper
+_NOISE_TAGS = frozenset({'nav', 'header', 'footer', 'aside', 'form', 'script', 'style', 'button', 'iframe'})
+_NOISE_CLASSES = frozenset({"sidebar", "comments", "share", "social", "ad"})
+_NOISE_IDS = frozenset({"sidebar", "comments", "ads"})
+_BLOCK_TAGS = frozenset({'h1', 'h2', 'h3', 'p', 'pre', 'li'})
+
+
+def _content_rank(element) -> int | None:
+    """
+    Priority of *element* as the main content container (lower wins), mirroring the
+    selectors: main, article, div[class*=post], div#content, div[class*=content],
+    div#main, div[class*=main], div[class*=entry-content].
+    """
+    if element.tag == 'main':
+        return 0
+    if element.tag == 'article':
+        return 1
+    if element.tag != 'div':
+        return None
+    classes = element.get('class') or ''
+    element_id = element.get('id')
+    if 'post' in classes:
+        return 2
+    if element_id == 'content':
+        return 3
+    if 'content' in classes:
+        return 4
+    if element_id == 'main':
+        return 5
+    if 'main' in classes:
+        return 6
+    return None  # 'entry-content' always contains 'content' (rank 4)
+
+
+def _is_noise(element) -> bool:
+    if element.tag in _NOISE_TAGS:
+        return True
+    classes = element.get('class')
+    if classes and not _NOISE_CLASSES.isdisjoint(classes.split()):
+        return True
+    return element.get('id') in _NOISE_IDS
+
+
+def _manual_fallback_scraper(html_content: str) -> tuple[str, str] | None:
     """
     A robust manual fallback scraper that tries several strategies to find main content.
     This is called by universal_scraper if trafilatura fails.
+
+    The page is parsed with lxml and walked once: noise subtrees are dropped as they
+    are reached, while content candidates and text blocks are recorded in the same
+    pass (see bench_scraper.py for the equivalence check against the old
+    BeautifulSoup implementation).
+
+    Returns (title, text), or None when the page has no body at all.
     """
-    soup = BeautifulSoup(html_content, "html.parser")
+    try:
+        # lxml parsers are not thread-safe, so each call gets its own (cheap to build)
+        root = lxml_html.document_fromstring(
+            html_content.encode("utf-8", "surrogatepass"), parser=lxml_html.HTMLParser(encoding="utf-8")
+        )
+    except (etree.ParserError, ValueError):
+        return None
 
     # 1. Get page title for context
-    page_title = soup.title.string.strip() if soup.title else 'No Title'
-
-    # 2. Aggressively decompose irrelevant tags
-    for tag in soup(['nav', 'header', 'footer', 'aside', 'form', 'script', 'style', 'button', 'iframe']):
-        tag.decompose()
-    # Also remove common noise containers by class/id (using CSS selectors)
-    for selector in [".sidebar", "#sidebar", ".comments", "#comments", ".share", ".social", ".ad", "#ads"]:
-        for element in soup.select(selector):
-            element.decompose()
-
-    # 3. Find the primary content container using a list of common selectors
-    main_content = None
-    # More comprehensive list of potential content containers
-    selectors = [
-        'main', 'article', 'div[class*="post"]', 'div[id="content"]',
-        'div[class*="content"]', 'div[id="main"]', 'div[class*="main"]',
-        'div[class*="entry-content"]'
-    ]
-    for selector in selectors:
-        main_content = soup.select_one(selector)
-        if main_content:
-            break
+    title = root.find('.//title')
+    page_title = (title.text or '').strip() if title is not None else 'No Title'
+
+    # 2-4. One traversal: prune noise, collect text blocks, and remember for the
+    # best candidate of each rank (and for <body>) which blocks it contains
+    blocks = []
+    candidates = {}  # rank -> (first block index, end block index)
+    body_range = None
+    stack = [(root, False)]
+    open_ranges = []
+    while stack:
+        element, leaving = stack.pop()
+        if leaving:
+            kind, start = open_ranges.pop()
+            if kind == 'body':
+                body_range = (start, len(blocks))
+            else:
+                candidates[kind] = (start, len(blocks))
+            continue
+        if not isinstance(element.tag, str):
+            continue  # comments and processing instructions
+        if element is not root and _is_noise(element):
+            element.drop_tree()
+            continue
+
+        tracked = None
+        rank = _content_rank(element)
+        if rank is not None and rank not in candidates and all(kind != rank for kind, _ in open_ranges):
+            tracked = rank
+        elif element.tag == 'body' and body_range is None and all(kind != 'body' for kind, _ in open_ranges):
+            tracked = 'body'
+        if tracked is not None:
+            open_ranges.append((tracked, len(blocks)))
+            stack.append((element, True))
 
-    # 4. If no specific container is found, use the whole body as a last resort
-    if not main_content:
-        main_content = soup.body
-        if not main_content:
-            return ""  # Return empty if there's no body
+        if element.tag in _BLOCK_TAGS:
+            blocks.append(element)
+        stack.extend((child, False) for child in reversed(element))
+
+    if candidates:
+        start, end = candidates[min(candidates)]
+    elif body_range is not None:
+        # If no specific container is found, use the whole body as a last resort
+        start, end = body_range
+    else:
+        return None  # Nothing to extract if there's no body
 
     # 5. Extract structured text from the chosen container
     content_parts = []
-    # Find all relevant tags: headings, paragraphs, code blocks, and list items
-    for element in main_content.find_all(['h1', 'h2', 'h3', 'p', 'pre', 'li'], recursive=True):
-        text = ''
-        if element.name.startswith('h'):
-            # Add extra newlines around headings for readability
-            text = f"\n\n{element.get_text(strip=True)}\n"
-        elif element.name == 'pre':
+    for element in blocks[start:end]:
+        if element.tag == 'pre':
             # Preserve code formatting and add markers
-            text = f"\n```\n{element.get_text()}\n```\n"
-        else:  # 'p' and 'li'
-            text = element.get_text(strip=True)
+            text = f"\n```\n{''.join(element.itertext())}\n```\n"
+        else:
+            stripped = ''.join(part.strip() for part in element.itertext())
+            # Add extra newlines around headings for readability
+            text = f"\n\n{stripped}\n" if element.tag[0] == 'h' else stripped
 
         # Filter out short, non-substantive text blocks
         if len(text.split()) > 4:
@@ -64,55 +182,170 @@ def _manual_fallback_scraper(html_content: str, url: str) -> str:
     # Normalize whitespace and excessive newlines
     clean_text = re.sub(r'\n{3,}', '\n\n', full_text).strip()
 
-    return f"Source: {url}\nTitle: {page_title}\n\n{clean_text}"
+    return page_title, clean_text
+
+
+def _extract_content(html_content: str) -> tuple[str, str] | None:
+    """
+    Extract (title, text) from a page, parsing it as few times as possible.
+    Trafilatura pulls the body text and the metadata out of one document tree;
+    the manual fallback only runs when that comes back too thin.
+    """
+    # --- Tier 1: Try Trafilatura (The Gold Standard) ---
+    document = trafilatura.bare_extraction(
+        html_content,
+        with_metadata=True,  # Title comes from the same parse as the text
+        include_comments=False,
+        include_links=False,
+        include_tables=False,  # Tables can be noisy
+        favor_precision=True  # Be stricter about what is considered main content
+    )
+    extracted_text = document.text.strip() if document and document.text else ""
+
+    if len(extracted_text) > 250:  # Check if it returned substantial content
+        return document.title or "No Title", extracted_text
 
+    # --- Tier 2: Manual Fallback Scraper ---
+    # If Trafilatura fails, our robust manual scraper gets its chance.
+    return _manual_fallback_scraper(html_content)
 
-def universal_scraper(url: str, timeout: int = 10, max_chars: int = 8192) -> str:
+
+def _cached_extract(html_content: str) -> tuple[str, str] | None:
+    """_extract_content behind a content-hash cache, so identical HTML is never re-extracted."""
+    key = hashlib.sha256(html_content.encode("utf-8", "surrogatepass")).hexdigest()
+    with _extraction_lock:
+        if key in _extraction_cache:
+            _extraction_cache.move_to_end(key)
+            extraction_stats["hits"] += 1
+            return _extraction_cache[key]
+        extraction_stats["misses"] += 1
+
+    try:
+        if extraction_pool is not None:
+            extracted = extraction_pool.run(_extract_content, html_content)
+        else:
+            extracted = _extract_content(html_content)
+    except TimeoutError as e:
+        print(f"[Scraper Error] {e}")
+        return None
+
+    with _extraction_lock:
+        _extraction_cache[key] = extracted
+        if len(_extraction_cache) > EXTRACTION_CACHE_SIZE:
+            _extraction_cache.popitem(last=False)
+    return extracted
+
+
+class UnsupportedContent(requests.exceptions.RequestException):
+    """The URL doesn't point to a page we can extract text from (PDF, video, huge download...)."""
+
+
+def _detect_encoding(response: requests.Response, head: bytes) -> str:
+    """Charset from the Content-Type header, else from a <meta> tag in the first bytes, else UTF-8."""
+    if "charset" in response.headers.get("Content-Type", "").lower() and response.encoding:
+        encoding = response.encoding
+    else:
+        match = _META_CHARSET.search(head[:4096])
+        encoding = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = "utf-8"
+    return encoding
+
+
+def _stream_download(http: requests.Session, url: str, headers: dict | None = None, timeout: float = 10,
+                     max_bytes: int = MAX_DOWNLOAD_BYTES) -> Download:
+    """
+    Streamed GET that never pulls more than *max_bytes* of body.
+
+    Content-Type and Content-Length are checked before the body is read, so PDFs,
+    media and oversized responses are rejected without downloading them. The body
+    is decoded incrementally and reading stops at the budget or at </html>. A body
+    cut at the budget carries it as truncated_at, so the cache can tell it apart.
+
+    Raises:
+        UnsupportedContent: for non-HTML content types or a Content-Length above MAX_CONTENT_LENGTH.
+    """
+    with http.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304:
+            return Download(response, b"", None)
+        response.raise_for_status()
+
+        mime = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if mime and mime not in ACCEPTED_CONTENT_TYPES:
+            raise UnsupportedContent(f"Skipping non-HTML content ({mime})", response=response)
+        length = response.headers.get("Content-Length", "")
+        if length.isdigit() and int(length) > MAX_CONTENT_LENGTH:
+            raise UnsupportedContent(f"Skipping {int(length)}-byte response", response=response)
+
+        body = bytearray()
+        parts = []
+        decoder = None
+        encoding = None
+        tail = ""
+        truncated_at = None
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            if decoder is None:
+                encoding = _detect_encoding(response, chunk)
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            chunk = chunk[:max_bytes - len(body)]
+            body += chunk
+            text = decoder.decode(chunk)
+            parts.append(text)
+            # Anything after the end of the document is of no use to the extractors
+            window = tail + text
+            if "</html>" in window.lower():
+                break
+            if len(body) >= max_bytes:
+                truncated_at = max_bytes  # the rest of the page was never read
+                break
+            tail = window[-6:]
+        if decoder is not None:
+            parts.append(decoder.decode(b"", final=True))
+
+    return Download(response, bytes(body), encoding, "".join(parts), truncated_at)
+
+
+def universal_scraper(url: str, timeout: int = 10, max_chars: int = 8192, http: requests.Session | None = None,
+                      use_cache: bool = True, max_bytes: int = MAX_DOWNLOAD_BYTES) -> str:
     """
     A highly robust and universal web scraper for LLMs.
 
     It uses a hybrid approach:
     1. Tries the specialized 'trafilatura' library for fast and accurate extraction.
-    2. If that fails, it uses a smart manual fallback with BeautifulSoup heuristics.
+    2. If that fails, it uses a smart manual fallback with lxml heuristics.
+
+    The page is streamed: non-HTML content is rejected from its headers and at most
+    *max_bytes* of body are read, so a stray PDF or video link costs next to nothing.
 
     Args:
         url (str): The URL to scrape.
         timeout (int): Request timeout in seconds.
         max_chars (int): Max characters to return to respect LLM context windows.
+        http (requests.Session): Client to download with; defaults to the shared pooled session.
+        use_cache (bool): Go through the on-disk HTTP cache (with conditional revalidation).
+        max_bytes (int): Download budget for the response body.
 
     Returns:
         A clean, formatted string of the website's main content, or None on failure.
     """
     try:
-        # Download the webpage once
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=timeout)
-        response.raise_for_status()
-        html_content = response.text
-
-        # --- Tier 1: Try Trafilatura (The Gold Standard) ---
-        extracted_text = trafilatura.extract(
-            html_content,
-            include_comments=False,
-            include_links=False,
-            include_tables=False,  # Tables can be noisy
-            favor_precision=True  # Be stricter about what is considered main content
-        )
+        # Download the webpage once (or revalidate our cached copy)
+        download = partial(_stream_download, max_bytes=max_bytes)
+        if use_cache:
+            html_content = http_cache.fetch(http or session, url, timeout=timeout, download=download,
+                                            max_bytes=max_bytes).text
+        else:
+            html_content = download(http or session, url, timeout=timeout).text
 
-        if extracted_text and len(extracted_text) > 250:  # Check if it returned substantial content
-            page_title = trafilatura.extract_metadata(html_content).title or "No Title"
-            formatted_content = f"Source: {url}\nTitle: {page_title}\n\n{extracted_text}"
-            return formatted_content[:max_chars]
+        extracted = _cached_extract(html_content)
+        if extracted is None:
+            return ""  # Return empty string if both methods fail
 
-        # --- Tier 2: Manual Fallback Scraper ---
-        # If Trafilatura fails, our robust manual scraper gets its chance.
-        manual_content = _manual_fallback_scraper(html_content, url)
-        if manual_content:
-            return manual_content[:max_chars]
-
-        return ""  # Return empty string if both methods fail
+        page_title, text = extracted
+        formatted_content = f"Source: {url}\nTitle: {page_title}\n\n{text}"
+        return formatted_content[:max_chars]
 
     except requests.exceptions.RequestException as e:
         print(f"[Scraper Error] Request failed for {url}: {e}")
@@ -122,3 +355,40 @@ def universal_scraper(url: str, timeout: int = 10, max_chars: int = 8192) -> str
         return None
 
 
+def scrape_many(urls: list[str], want: int = 1, deadline: float = 15.0, min_chars: int = 250,
+                timeout: int = 10, max_chars: int = 8192) -> list[str]:
+    """
+    Scrape several URLs in parallel and keep the first good extractions.
+
+    Every URL is fetched at once over the shared session. Results are collected in
+    the order they land, and the call returns as soon as *want* of them have at
+    least *min_chars* characters, or when *deadline* seconds have passed.
+
+    Args:
+        urls (list[str]): Candidate URLs, e.g. the top search results.
+        want (int): How many good extractions to wait for.
+        deadline (float): Overall time budget in seconds.
+        min_chars (int): Minimum length for an extraction to count as good.
+        timeout (int): Per-request timeout handed to universal_scraper.
+        max_chars (int): Per-page cap handed to universal_scraper.
+
+    Returns:
+        Up to *want* extracted pages, fastest first (possibly empty).
+    """
+    pending = {_fetch_executor.submit(universal_scraper, url, timeout, max_chars) for url in urls}
+    good = []
+    stop_at = time.monotonic() + deadline
+    while pending and len(good) < want:
+        remaining = stop_at - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            content = future.result()
+            if content and len(content) >= min_chars and len(good) < want:
+                good.append(content)
+
+    # Slow candidates that haven't started yet are dropped; running ones finish in the background
+    for future in pending:
+        future.cancel()
+    return good
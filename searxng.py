@@ -1,17 +1,405 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import httpx
 import requests
 import dotenv
+from requests.adapters import HTTPAdapter
 
 dotenv.load_dotenv()
 
+SEARXNG_URL = os.getenv("SEARXNG_URL", "http://127.0.0.1:8080/search")
+# Comma-separated list of instances; the first healthy, fastest one is tried first
+SEARXNG_URLS = [url.strip() for url in os.getenv("SEARXNG_URLS", SEARXNG_URL).split(",") if url.strip()]
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "10"))
+
+
+class _Backend:
+    """Latency samples and health of one SearXNG instance."""
+
+    def __init__(self, url: str, samples: int = 100):
+        self.url = url
+        self.latencies: deque[float] = deque(maxlen=samples)
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    def p95(self, default: float) -> float:
+        if len(self.latencies) < 5:
+            return default
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class SearxngClient:
+    """
+    SearXNG client over one pooled session, spread across several instances.
+
+    Each search has an overall *timeout*. If the first backend hasn't answered
+    within its observed p95 latency (or *hedge_after* seconds when set), the same
+    query is fired at the next backend and the first good answer wins. A backend
+    that fails *eject_after* times in a row is left out for *eject_for* seconds.
+    """
+
+    def __init__(self, backends: list[str], timeout: float = 10.0, hedge_after: float | None = None,
+                 initial_hedge: float = 1.0, eject_after: int = 3, eject_for: float = 30.0,
+                 max_parallel: int = 2, pool_size: int = 16):
+        if not backends:
+            raise ValueError("SearxngClient needs at least one backend URL")
+        self.backends = [_Backend(url) for url in backends]
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.initial_hedge = initial_hedge
+        self.eject_after = eject_after
+        self.eject_for = eject_for
+        self.max_parallel = max_parallel
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers.update({"Accept": "application/json"})
+        adapter = HTTPAdapter(pool_connections=len(backends), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="searxng")
+
+    def _ranked(self) -> list[_Backend]:
+        now = time.monotonic()
+        with self._lock:
+            healthy = [b for b in self.backends if b.healthy(now)]
+            if not healthy:
+                # Everyone is ejected: try the one coming back soonest rather than nothing
+                return sorted(self.backends, key=lambda b: b.ejected_until)
+            return sorted(healthy, key=lambda b: b.p95(self.initial_hedge))
+
+    def _record(self, backend: _Backend, latency: float | None):
+        with self._lock:
+            backend.requests += 1
+            if latency is not None:
+                backend.latencies.append(latency)
+                backend.consecutive_failures = 0
+                backend.ejected_until = 0.0
+                return
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            if backend.consecutive_failures >= self.eject_after:
+                print(f"[SearXNG] Ejecting {backend.url} for {self.eject_for}s after "
+                      f"{backend.consecutive_failures} failures")
+                backend.ejected_until = time.monotonic() + self.eject_for
+
+    def _query(self, backend: _Backend, params: dict, timeout: float) -> list:
+        started = time.perf_counter()
+        try:
+            response = self.session.get(backend.url, params=params, timeout=timeout)
+            response.raise_for_status()
+            results = response.json()["results"]
+        except (requests.exceptions.RequestException, ValueError, KeyError):
+            self._record(backend, None)
+            raise
+        self._record(backend, time.perf_counter() - started)
+        return results
+
+    def search(self, question: str, categories: str = "general") -> list:
+        params = {
+            "q": question,
+            "categories": categories,
+            "format": "json"
+        }
+        deadline = time.monotonic() + self.timeout
+        queue = self._ranked()
+        pending = {}
+        error = None
+
+        def launch():
+            backend = queue.pop(0)
+            remaining = max(deadline - time.monotonic(), 0.1)
+            pending[self._executor.submit(self._query, backend, params, remaining)] = backend
+
+        launch()
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            can_hedge = queue and len(pending) < self.max_parallel
+            first = next(iter(pending.values()))
+            hedge_delay = self.hedge_after if self.hedge_after is not None else first.p95(self.initial_hedge)
+            done, _ = wait(pending, timeout=min(hedge_delay, remaining) if can_hedge else remaining,
+                           return_when=FIRST_COMPLETED)
+
+            for future in done:
+                pending.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                for other in pending:
+                    other.cancel()
+                return results
+
+            if time.monotonic() >= deadline:
+                break
+            # Either the hedge timer fired or a backend failed: bring in the next one
+            if queue and len(pending) < self.max_parallel:
+                if not done:
+                    with self._lock:
+                        self.hedges += 1
+                launch()
+
+        for future in pending:
+            future.cancel()
+        if error is not None and not pending:
+            raise error
+        raise requests.exceptions.Timeout(f"No SearXNG backend answered within {self.timeout}s")
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "hedges": self.hedges,
+                "backends": [
+                    {
+                        "url": b.url,
+                        "healthy": b.healthy(now),
+                        "requests": b.requests,
+                        "failures": b.failures,
+                        "p95": b.p95(self.initial_hedge),
+                    }
+                    for b in self.backends
+                ],
+            }
+
+
+class AsyncSearxngClient:
+    """
+    asyncio twin of SearxngClient for event-loop callers (FastAPI). Requests go
+    through httpx instead of a thread, losing hedges are really cancelled, and
+    backend health and latency stats are shared with the sync client.
+    """
+
+    def __init__(self, sync_client: SearxngClient):
+        self.sync = sync_client
+        self._http: httpx.AsyncClient | None = None
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(headers={"Accept": "application/json"},
+                                           limits=httpx.Limits(max_connections=32))
+        return self._http
+
+    async def _query(self, backend: _Backend, params: dict, timeout: float) -> list:
+        started = time.perf_counter()
+        try:
+            response = await self._client().get(backend.url, params=params, timeout=timeout)
+            response.raise_for_status()
+            results = response.json()["results"]
+        except (httpx.HTTPError, ValueError, KeyError):
+            self.sync._record(backend, None)
+            raise
+        self.sync._record(backend, time.perf_counter() - started)
+        return results
+
+    async def search(self, question: str, categories: str = "general") -> list:
+        params = {
+            "q": question,
+            "categories": categories,
+            "format": "json"
+        }
+        sync = self.sync
+        deadline = time.monotonic() + sync.timeout
+        queue = sync._ranked()
+        pending = {}
+        error = None
 
-def search(question : str):
-    url = "http://127.0.0.1:8080/search"
-    headers = {"Accept": "application/json"}
-    params = {
-        "q": question,
-        "categories": "general",
-        "format": "json"
+        def launch():
+            backend = queue.pop(0)
+            remaining = max(deadline - time.monotonic(), 0.1)
+            pending[asyncio.ensure_future(self._query(backend, params, remaining))] = backend
+
+        launch()
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                can_hedge = queue and len(pending) < sync.max_parallel
+                first = next(iter(pending.values()))
+                hedge_delay = sync.hedge_after if sync.hedge_after is not None else first.p95(sync.initial_hedge)
+                done, _ = await asyncio.wait(pending, timeout=min(hedge_delay, remaining) if can_hedge else remaining,
+                                             return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    pending.pop(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        error = e
+
+                if time.monotonic() >= deadline:
+                    break
+                # Either the hedge timer fired or a backend failed: bring in the next one
+                if queue and len(pending) < sync.max_parallel:
+                    if not done:
+                        with sync._lock:
+                            sync.hedges += 1
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if error is not None and not pending:
+            raise error
+        raise httpx.TimeoutException(f"No SearXNG backend answered within {sync.timeout}s")
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+client = SearxngClient(SEARXNG_URLS, timeout=SEARCH_TIMEOUT)
+async_client = AsyncSearxngClient(client)
+
+
+def normalize_query(question: str) -> str:
+    return " ".join(question.split()).casefold()
+
+
+class SearchCache:
+    """
+    LRU + TTL cache of search results with single-flight coalescing: while a query
+    is being fetched, identical concurrent queries wait for that one upstream
+    request instead of sending their own.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 15 * 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple, tuple[float, list]] = OrderedDict()
+        self._inflight: dict[tuple, Future] = {}
+        self._async_inflight: dict[tuple, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_time = 0.0
+        self.upstream_max = 0.0
+
+    def get_or_fetch(self, key: tuple, fetch) -> list:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[1])
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return list(future.result())
+
+        started = time.perf_counter()
+        try:
+            results = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        self._store(key, results, time.perf_counter() - started)
+        with self._lock:
+            del self._inflight[key]
+        future.set_result(results)
+        return list(results)
+
+    async def aget_or_fetch(self, key: tuple, fetch) -> list:
+        """Async get_or_fetch: *fetch* is a coroutine function, coalescing happens on the event loop."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[1])
+            task = self._async_inflight.get(key)
+            if task is None:
+                task = self._async_inflight[key] = asyncio.ensure_future(self._afetch(key, fetch))
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        # shield: one caller going away must not cancel the fetch the others are waiting on
+        return list(await asyncio.shield(task))
+
+    async def _afetch(self, key: tuple, fetch) -> list:
+        started = time.perf_counter()
+        try:
+            results = await fetch()
+        finally:
+            with self._lock:
+                del self._async_inflight[key]
+        self._store(key, results, time.perf_counter() - started)
+        return results
+
+    def _store(self, key: tuple, results: list, elapsed: float):
+        with self._lock:
+            self.upstream_calls += 1
+            self.upstream_time += elapsed
+            self.upstream_max = max(self.upstream_max, elapsed)
+            self._entries[key] = (time.monotonic(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "upstream_calls": self.upstream_calls,
+                "upstream_avg_latency": self.upstream_time / self.upstream_calls if self.upstream_calls else 0.0,
+                "upstream_max_latency": self.upstream_max,
+            }
+
+
+search_cache = SearchCache()
+
+
+def clean_item(item):
+    return {
+        "title": item.get("title", ""),
+        "url": item.get("url", ""),
+        "content": item.get("content", "")[:200] + "...",  # truncate long content
+        "score": item.get("score", 0.0)
     }
-    response = requests.get(url, params=params, headers=headers)
-    data = response.json()
-    return data["results"]
+
+
+def search(question : str, categories: str = "general", use_cache: bool = True):
+    if not use_cache:
+        return client.search(question, categories)
+    key = (normalize_query(question), categories)
+    return search_cache.get_or_fetch(key, lambda: client.search(question, categories))
+
+
+async def asearch(question: str, categories: str = "general", use_cache: bool = True):
+    """Non-blocking search() for async callers."""
+    if not use_cache:
+        return await async_client.search(question, categories)
+    key = (normalize_query(question), categories)
+    return await search_cache.aget_or_fetch(key, lambda: async_client.search(question, categories))
@@ -0,0 +1,105 @@
+import re
+from dataclasses import dataclass
+
+# execute_tool appends the whole vault tree after this marker on every docker step
+TREE_MARKER = "\n\n📁 Tree of THE OBSIDIAN VAULT"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class Turn:
+    question: str
+    result: str
+
+    def verbatim(self) -> str:
+        return f"\n> {self.question}\n{self.result}\n"
+
+    def compact(self, max_chars: int) -> str:
+        flat = re.sub(r"\s+", " ", self.result).strip()
+        if len(flat) > max_chars:
+            flat = flat[:max_chars].rstrip() + " …"
+        return f"\n> {self.question}\n(earlier result, compacted) {flat}\n"
+
+
+class SessionContext:
+    """
+    Conversation context handed to llm() on every step, kept under a token budget.
+
+    The last *keep_recent* turns are kept verbatim, older ones shrink to a one-line
+    extract, and vault tree snapshots are stripped from results: only the newest
+    one is rendered, once, trimmed to at most a third of the budget. When the
+    turns still don't fit, fewer of them stay verbatim, then the oldest are
+    dropped, and as a last resort the newest turn is cut (keeping its end).
+    """
+
+    def __init__(self, budget: int = 6000, keep_recent: int = 2, summary_chars: int = 300):
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.summary_chars = summary_chars
+        self.turns: list[Turn] = []
+        self.tree: str | None = None
+        self.trees_deduped = 0
+        self.raw_tokens = 0  # what the plain concatenated history would have cost
+
+    def add(self, question: str, result: str):
+        result = str(result)
+        self.raw_tokens += estimate_tokens(Turn(question, result).verbatim())
+        head, marker, tree = result.partition(TREE_MARKER)
+        if marker:
+            if self.tree is not None:
+                self.trees_deduped += 1
+            self.tree = (marker + tree).strip()
+            result = head
+        self.turns.append(Turn(question, result))
+
+    def _render_turns(self, verbatim: int, dropped: int) -> str:
+        turns = self.turns[dropped:]
+        split = max(len(turns) - verbatim, 0)
+        parts = [turn.compact(self.summary_chars) for turn in turns[:split]]
+        parts += [turn.verbatim() for turn in turns[split:]]
+        return "".join(parts)
+
+    def _fit_tree(self, room: int) -> str:
+        if not self.tree or room < 32:
+            return ""
+        tree = f"\n{self.tree}\n"
+        if estimate_tokens(tree) <= room:
+            return tree
+        lines = tree.splitlines(keepends=True)
+        kept, used = [], estimate_tokens("… (0000 more entries)\n")
+        for line in lines:
+            used += estimate_tokens(line)
+            if used > room:
+                break
+            kept.append(line)
+        return "".join(kept) + f"… ({len(lines) - len(kept)} more entries)\n"
+
+    def render(self, budget: int | None = None) -> str:
+        """The context to prepend to the next prompt, at most *budget* tokens."""
+        budget = budget or self.budget
+        # The newest tree keeps up to a third of the budget; turns get the rest
+        tree_room = min(estimate_tokens(self.tree), budget // 3) if self.tree else 0
+        # Compact turns first (newest last), then drop the oldest ones
+        verbatim = min(self.keep_recent, len(self.turns))
+        attempts = [(v, 0) for v in range(verbatim, -1, -1)] + [(0, d) for d in range(1, len(self.turns))]
+        for verbatim, dropped in attempts:
+            turns = self._render_turns(verbatim, dropped)
+            if estimate_tokens(turns) <= budget - tree_room:
+                return turns + self._fit_tree(budget - estimate_tokens(turns))
+        # Even the newest turn alone is too big: cut it, keeping its end
+        return turns[-(budget - tree_room) * 4:] + self._fit_tree(tree_room)
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.render())
+
+    def stats(self) -> dict:
+        return {
+            "turns": len(self.turns),
+            "tokens": self.tokens(),
+            "raw_tokens": self.raw_tokens,
+            "trees_deduped": self.trees_deduped,
+        }
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class SqliteLruStore:
+    """
+    Size-bounded key/value table in SQLite, shared by the on-disk caches.
+
+    Rows are *columns* (name -> SQL type) under a text primary key *key_column*,
+    plus the bookkeeping: `last_access`, bumped by every get, and `size`, the
+    bytes a row counts for. Once the sizes add up to more than *max_bytes*, the
+    least recently used rows are evicted.
+    """
+
+    def __init__(self, path: str, columns: dict[str, str], max_bytes: int, key_column: str = "key",
+                 table: str = "responses"):
+        self.path = path
+        self.columns = list(columns)
+        self.max_bytes = max_bytes
+        self.key_column = key_column
+        self.table = table
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        schema = ", ".join([f"{key_column} TEXT PRIMARY KEY"] + [f"{name} {kind}" for name, kind in columns.items()]
+                           + ["last_access REAL", "size INTEGER"])
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} ({schema})")
+        # Columns added since the file was created (its older rows read them as NULL)
+        existing = {row[1] for row in self._db.execute(f"PRAGMA table_info({table})")}
+        for name, kind in columns.items():
+            if name not in existing:
+                self._db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+        self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_lru ON {table} (last_access)")
+        self._db.commit()
+
+    def get(self, key: str, columns: list[str] | None = None) -> tuple | None:
+        """The *columns* (default: all) of *key*'s row, or None; a hit counts as an access."""
+        columns = columns or self.columns
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(columns)} FROM {self.table} WHERE {self.key_column} = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(f"UPDATE {self.table} SET last_access = ? WHERE {self.key_column} = ?",
+                             (time.time(), key))
+            self._db.commit()
+        return row
+
+    def put(self, key: str, values: dict, size: int):
+        """Insert or replace *key*'s row, then evict down to max_bytes."""
+        names = [self.key_column, *values, "last_access", "size"]
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                (key, *values.values(), time.time(), size),
+            )
+            self._evict()
+            self._db.commit()
+
+    def update(self, key: str, **values):
+        """Set some columns of *key*'s row, without counting it as an access."""
+        assignments = ", ".join(f"{name} = ?" for name in values)
+        with self._lock:
+            self._db.execute(f"UPDATE {self.table} SET {assignments} WHERE {self.key_column} = ?",
+                             (*values.values(), key))
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute(f"SELECT {self.key_column}, size FROM {self.table} ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute(f"DELETE FROM {self.table} WHERE {self.key_column} = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._db.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        return {"evictions": self.evictions, "entries": entries, "bytes": size}
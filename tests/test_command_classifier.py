@@ -0,0 +1,105 @@
+import pytest
+
+from container import is_bare_cd, is_cacheable_command, is_mutating_command
+
+
+@pytest.mark.parametrize("command", [
+    "ls -la",
+    "find /opt/FMHY-RAG -name '*.md' -type f",
+    "grep -rn 'Docker' /opt/FMHY-RAG 2>/dev/null | head -20",
+    "cat notes.md | sort | uniq -c",
+    "ls > /dev/null 2>&1",
+    "ls\nfind . -maxdepth 2",
+    "tree -L 2",
+])
+def test_read_only(command):
+    assert not is_mutating_command(command)
+
+
+@pytest.mark.parametrize("command", [
+    "ls\nrm -rf x",
+    "echo a\ntouch b",
+    "ls;\nmkdir y",
+    "sort -o out.txt in.txt",
+    "sort -ro out.txt in.txt",
+    "sort --output=out.txt in.txt",
+    "uniq in.txt out.txt",
+    "tree -o tree.txt",
+    "find . -fprint0 list",
+    "find . -name '*.tmp' -delete",
+    "find . -exec rm {} +",
+    "cat a >& out",
+    "cat a &> out",
+    "echo hi >> notes.md",
+    "awk '{ print > \"f\" }' notes.md",
+    "sed -n 'w copy.md' notes.md",
+    "sed -i s/a/b/ notes.md",
+    "ls | xargs rm",
+    "echo $(rm x)",
+    "cd 03_Notes",
+    "mv a.md 99_Archive/",
+    "ls 'unterminated",
+])
+def test_mutating(command):
+    assert is_mutating_command(command)
+
+
+def test_descriptor_duplication_is_not_a_write():
+    assert not is_mutating_command("ls 2>&1")
+    assert not is_mutating_command("ls >&2")
+
+
+VAULT = "/opt/FMHY-RAG"
+
+
+@pytest.mark.parametrize("command", [
+    "find /opt/FMHY-RAG -name '*.md' -type f | sort",
+    "find . -maxdepth 2 -size -5k -print",
+    "cat 03_Notes/a.md",
+    "grep -rl Docker /opt/FMHY-RAG 2>/dev/null",
+    "ls -la\nwc -l notes.md",
+    "cat < 03_Notes/a.md",
+    "grep -r --include=*.md Docker .",
+])
+def test_cacheable(command):
+    assert is_cacheable_command(command, VAULT, VAULT)
+
+
+@pytest.mark.parametrize("command", [
+    "date",
+    "du -sh /opt/FMHY-RAG",
+    "find . -mmin -5",
+    "find . -newermt yesterday",
+    "ls | xargs cat",
+    "sed -n 1,5p notes.md",
+    "cd /opt && ls",
+    "ls\nrm x",
+    "sort -o out in",
+    "",
+    "echo $RANDOM",
+    "echo $EPOCHSECONDS",
+    "printf '%(%s)T' -1",
+    "cat /proc/uptime",
+    "ls -la /tmp",
+    "cat /sys/class/net/eth0/address",
+    "cat ../../proc/uptime",
+    "cat < /proc/uptime",
+    "grep --file=/tmp/patterns -r .",
+    "ls ~",
+])
+def test_not_cacheable(command):
+    assert not is_cacheable_command(command, VAULT, VAULT)
+
+
+def test_cacheable_only_inside_the_root():
+    assert not is_cacheable_command("ls -la", "/tmp", VAULT)
+    assert not is_cacheable_command("ls -la", VAULT, None)
+    assert is_cacheable_command("cat a.md", VAULT + "/03_Notes", VAULT)
+
+
+def test_bare_cd():
+    assert is_bare_cd("cd /opt/FMHY-RAG")
+    assert is_bare_cd("cd")
+    assert not is_bare_cd("cd X && rm Y")
+    assert not is_bare_cd("cd X\nmkdir Z")
+    assert not is_bare_cd("ls")
@@ -0,0 +1,105 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from llm_cache import LlmCache
+
+
+class StubClient:
+    """Stands in for genai.Client: answers `<model>:<contents>` after *delay* seconds."""
+
+    def __init__(self, delay: float = 0.01, text=None):
+        self.delay = delay
+        self.text = text
+        self.calls = []
+        self.models = self
+
+    def generate_content(self, model, config, contents):
+        self.calls.append((model, config["system_instruction"], contents))
+        time.sleep(self.delay)
+        return SimpleNamespace(text=self.text if self.text is not None else f"{model}:{contents}")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LlmCache(str(tmp_path / "llm_cache.sqlite3"))
+
+
+def test_hit_after_miss(cache):
+    client = StubClient()
+
+    first = cache.generate(client, "gemini", "system", "question")
+    second = cache.generate(client, "gemini", "system", "question")
+
+    assert first == second == "gemini:question"
+    assert len(client.calls) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+    assert stats["latency_saved"] >= 0.01
+
+
+@pytest.mark.parametrize("model, system, contents", [
+    ("other-model", "system", "question"),
+    ("gemini", "other system", "question"),
+    ("gemini", "system", "other question"),
+])
+def test_key_covers_model_system_and_contents(cache, model, system, contents):
+    client = StubClient()
+    cache.generate(client, "gemini", "system", "question")
+    cache.generate(client, model, system, contents)
+    assert len(client.calls) == 2
+
+
+def test_opt_out_calls_the_model_and_refreshes(cache):
+    client = StubClient(text="old")
+    cache.generate(client, "gemini", "system", "question")
+    client.text = "new"
+
+    assert cache.generate(client, "gemini", "system", "question", use_cache=False) == "new"
+    assert cache.generate(client, "gemini", "system", "question") == "new"
+    assert len(client.calls) == 2
+    assert cache.stats()["bypassed"] == 1
+
+
+def test_rejected_and_empty_answers_are_not_cached(cache):
+    client = StubClient(text="not json")
+    cache.generate(client, "gemini", "system", "plan", accept=lambda text: text.startswith("{"))
+    client.text = ""
+    cache.generate(client, "gemini", "system", "empty")
+
+    assert cache.stats()["entries"] == 0
+    cache.generate(client, "gemini", "system", "plan", accept=lambda text: text.startswith("{"))
+    assert len(client.calls) == 3
+
+
+def test_evicts_least_recently_used(tmp_path):
+    # Every answer is 42 bytes: three fit, a fourth doesn't
+    cache = LlmCache(str(tmp_path / "small.sqlite3"), max_bytes=130)
+    client = StubClient(delay=0)
+    for name in ("a", "b", "c"):
+        cache.generate(client, "m", "s", name * 40)
+        time.sleep(0.01)
+    # Reading "a" makes "b" the least recently used
+    cache.generate(client, "m", "s", "a" * 40)
+    time.sleep(0.01)
+    cache.generate(client, "m", "s", "d" * 40)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["evictions"], stats["entries"]) == (1, 1, 3)
+    assert stats["bytes"] <= 130
+    assert cache.get(cache.key("m", "s", "b" * 40)) is None
+    assert cache.get(cache.key("m", "s", "a" * 40)) is not None
+    assert cache.get(cache.key("m", "s", "d" * 40)) is not None
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "persist.sqlite3")
+    client = StubClient()
+    LlmCache(path).generate(client, "gemini", "system", "question")
+
+    reopened = LlmCache(path)
+    assert reopened.generate(client, "gemini", "system", "question") == "gemini:question"
+    assert len(client.calls) == 1
+    assert reopened.stats()["hits"] == 1
@@ -0,0 +1,173 @@
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from llm_cache import LlmCache
+from llm_gateway import LlmGateway, is_transient
+
+
+class FakeApiError(Exception):
+    """Shaped like google.genai's APIError: the HTTP status is in `.code`."""
+
+    def __init__(self, code: int, message: str = ""):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeModelClient:
+    """Blocking genai-style client talking to a local fake model server."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.models = self
+
+    def generate_content(self, model, config, contents):
+        response = httpx.post(f"{self.url}/models/{model}:generateContent",
+                              json={"system": config["system_instruction"], "contents": contents}, timeout=30)
+        if response.status_code >= 400:
+            raise FakeApiError(response.status_code, response.text)
+        return SimpleNamespace(text=response.json()["text"])
+
+
+def model_server(stub_server, statuses=(), delay=0.0):
+    """Fake model: answers with *statuses* in turn (then 200), echoing the contents."""
+    queue = iter(statuses)
+
+    def handler(request):
+        status = next(queue, 200)
+        if status != 200:
+            return status, {"error": "unavailable"}, 0
+        return 200, {"text": f"echo: {request['body']['contents']}"}, delay
+
+    return stub_server(handler)
+
+
+@pytest.fixture
+def gateways():
+    created = []
+
+    def make(url, **options):
+        options = {"rate": 1000, "burst": 100, "backoff": 0.01, "max_backoff": 0.05, **options}
+        gateway = LlmGateway(FakeModelClient(url), **options)
+        created.append(gateway)
+        return gateway
+
+    yield make
+    for gateway in created:
+        gateway.close()
+
+
+def call(gateway, contents="hi", **kwargs):
+    return gateway.models.generate_content(model="fake", config={"system_instruction": "sys"}, contents=contents,
+                                           **kwargs)
+
+
+def call_many(gateway, count):
+    async def run():
+        return await asyncio.gather(*(
+            gateway.generate_content("fake", {"system_instruction": "sys"}, f"q{i}") for i in range(count)
+        ))
+
+    return gateway.run(run())
+
+
+def test_is_transient():
+    assert is_transient(httpx.ConnectTimeout("slow"))
+    assert is_transient(ConnectionResetError())
+    assert is_transient(FakeApiError(429))
+    assert is_transient(FakeApiError(503))
+    assert not is_transient(FakeApiError(400))
+    assert not is_transient(ValueError("bad"))
+
+
+def test_sync_facade_returns_the_response(stub_server, gateways):
+    gateway = gateways(model_server(stub_server).url)
+    assert call(gateway).text == "echo: hi"
+    assert gateway.stats()["calls"] == 1
+
+
+def test_retries_transient_errors(stub_server, gateways):
+    server = model_server(stub_server, statuses=(503, 429))
+    gateway = gateways(server.url, retries=3)
+
+    assert call(gateway).text == "echo: hi"
+    stats = gateway.stats()
+    assert (stats["calls"], stats["attempts"], stats["retries"], stats["failures"]) == (1, 3, 2, 0)
+    assert len(server.requests) == 3
+
+
+def test_does_not_retry_client_errors(stub_server, gateways):
+    gateway = gateways(model_server(stub_server, statuses=(400,)).url, retries=3)
+
+    with pytest.raises(FakeApiError) as error:
+        call(gateway)
+    assert error.value.code == 400
+    stats = gateway.stats()
+    assert (stats["attempts"], stats["retries"], stats["failures"]) == (1, 0, 1)
+
+
+def test_gives_up_after_retries(stub_server, gateways):
+    server = model_server(stub_server, statuses=itertools.repeat(500, 10))
+    gateway = gateways(server.url, retries=2)
+
+    with pytest.raises(FakeApiError):
+        call(gateway)
+    assert len(server.requests) == 3
+    assert gateway.stats()["failures"] == 1
+
+
+def test_deadline(stub_server, gateways):
+    gateway = gateways(model_server(stub_server, delay=2).url)
+
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        call(gateway, deadline=0.3)
+    assert time.perf_counter() - started < 1
+    assert gateway.stats()["deadline_exceeded"] == 1
+
+
+def test_rate_limit(stub_server, gateways):
+    gateway = gateways(model_server(stub_server).url, rate=20, burst=1)
+
+    started = time.perf_counter()
+    answers = call_many(gateway, 6)
+
+    # One token up front, then one every 50ms
+    assert time.perf_counter() - started >= 0.2
+    assert [answer.text for answer in answers] == [f"echo: q{i}" for i in range(6)]
+    assert gateway.stats()["throttled_time"] > 0
+
+
+def test_max_in_flight(stub_server, gateways):
+    server = model_server(stub_server, delay=0.2)
+    gateway = gateways(server.url, max_in_flight=2)
+
+    call_many(gateway, 6)
+
+    assert server.max_active == 2
+
+
+def test_latency_histogram(stub_server, gateways):
+    gateway = gateways(model_server(stub_server, delay=0.15).url)
+    for _ in range(3):
+        call(gateway)
+
+    latency = gateway.stats()["latency"]
+    assert sum(latency["buckets"].values()) == 3
+    assert latency["buckets"]["<=0.25s"] == 3
+    assert 0.15 <= latency["avg"] <= 0.25
+    assert latency["p95"] == 0.25
+
+
+def test_cache_in_front_of_gateway(stub_server, gateways, tmp_path):
+    server = model_server(stub_server)
+    gateway = gateways(server.url)
+    cache = LlmCache(str(tmp_path / "cache.sqlite3"))
+
+    assert cache.generate(gateway, "fake", "sys", "question") == "echo: question"
+    assert cache.generate(gateway, "fake", "sys", "question") == "echo: question"
+    assert len(server.requests) == 1
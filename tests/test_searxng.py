@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+import requests
+
+from searxng import AsyncSearxngClient, SearxngClient
+
+
+def answer(name, delay=0.0, status=200):
+    return lambda request: (status, {"results": [{"url": f"https://{name}.example", "title": name}]}, delay)
+
+
+def test_returns_first_backend_results(stub_server):
+    fast = stub_server(answer("fast"))
+    client = SearxngClient([fast.url], timeout=2)
+
+    results = client.search("obsidian vault")
+
+    assert results[0]["title"] == "fast"
+    assert fast.requests[0]["query"]["q"] == ["obsidian vault"]
+    assert fast.requests[0]["query"]["format"] == ["json"]
+
+
+def test_hedges_to_next_backend_when_first_is_slow(stub_server):
+    slow = stub_server(answer("slow", delay=2))
+    fast = stub_server(answer("fast"))
+    client = SearxngClient([slow.url, fast.url], timeout=3, hedge_after=0.1)
+
+    started = time.perf_counter()
+    results = client.search("hedge")
+
+    assert results[0]["title"] == "fast"
+    assert time.perf_counter() - started < 1
+    assert client.hedges == 1
+
+
+def test_fails_over_on_error_without_waiting_for_hedge(stub_server):
+    broken = stub_server(answer("broken", status=500))
+    healthy = stub_server(answer("healthy"))
+    client = SearxngClient([broken.url, healthy.url], timeout=3, hedge_after=5)
+
+    started = time.perf_counter()
+    assert client.search("failover")[0]["title"] == "healthy"
+    assert time.perf_counter() - started < 1
+    assert client.hedges == 0
+
+
+def test_ejects_backend_after_consecutive_failures(stub_server):
+    broken = stub_server(answer("broken", status=503))
+    healthy = stub_server(answer("healthy"))
+    client = SearxngClient([broken.url, healthy.url], timeout=3, hedge_after=5, eject_after=2, eject_for=60)
+
+    for _ in range(4):
+        assert client.search("eject")[0]["title"] == "healthy"
+
+    # Two failures eject it; the later searches go straight to the healthy one
+    assert len(broken.requests) == 2
+    stats = {backend["url"]: backend for backend in client.stats()["backends"]}
+    assert not stats[broken.url]["healthy"]
+    assert stats[broken.url]["failures"] == 2
+    assert stats[healthy.url]["healthy"]
+
+
+def test_deadline_when_no_backend_answers(stub_server):
+    hung = stub_server(answer("hung", delay=5))
+    client = SearxngClient([hung.url], timeout=0.5)
+
+    started = time.perf_counter()
+    with pytest.raises(requests.exceptions.Timeout):
+        client.search("deadline")
+    assert time.perf_counter() - started < 1.5
+
+
+def test_async_client_hedges_and_shares_stats(stub_server):
+    slow = stub_server(answer("slow", delay=2))
+    fast = stub_server(answer("fast"))
+    sync = SearxngClient([slow.url, fast.url], timeout=3, hedge_after=0.1)
+
+    async def run():
+        client = AsyncSearxngClient(sync)
+        try:
+            return await client.search("async hedge")
+        finally:
+            await client.aclose()
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+
+    assert results[0]["title"] == "fast"
+    assert time.perf_counter() - started < 1
+    assert sync.hedges == 1
+    assert sync.stats()["backends"][1]["requests"] == 1
+
+
+def test_async_client_deadline(stub_server):
+    hung = stub_server(answer("hung", delay=5))
+    sync = SearxngClient([hung.url], timeout=0.5)
+
+    async def run():
+        client = AsyncSearxngClient(sync)
+        try:
+            return await client.search("deadline")
+        finally:
+            await client.aclose()
+
+    with pytest.raises(httpx.TimeoutException):
+        asyncio.run(run())
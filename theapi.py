@@ -1,8 +1,44 @@
-from fastapi import FastAPI
-from searxng import search
+import asyncio
+import json
+import os
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from searxng import asearch, async_client, clean_item
+from scraper import universal_scraper
 
 app = FastAPI()
 
+# Container commands run on a warm pool behind a bounded executor (created on first use)
+DOCKER_POOL_SIZE = int(os.getenv("DOCKER_POOL_SIZE", "2"))
+DOCKER_MAX_CONCURRENCY = int(os.getenv("DOCKER_MAX_CONCURRENCY", str(DOCKER_POOL_SIZE)))
+_docker_shell = None
+_docker_lock = asyncio.Lock()
+
+
+async def get_docker_shell():
+    global _docker_shell
+    async with _docker_lock:
+        if _docker_shell is None:
+            from async_shell import AsyncDockerShell
+            from container_pool import ContainerPool
+
+            # Booting the pool is blocking Docker work too: keep it off the loop.
+            # vault_root=None: what a command writes to the vault is kept on release
+            pool = await asyncio.to_thread(ContainerPool, size=DOCKER_POOL_SIZE, vault_root=None)
+            _docker_shell = AsyncDockerShell(pool, max_concurrency=DOCKER_MAX_CONCURRENCY)
+    return _docker_shell
+
+
+@app.on_event("shutdown")
+async def close_docker_shell():
+    if _docker_shell is not None:
+        _docker_shell.close()
+    await async_client.aclose()
+
+
 @app.get("/")
 async def read_root():
 
@@ -10,27 +46,108 @@ async def read_root():
 @app.get("/Search")
 async def read_item(question: str):
     print("questions :", question)
-    raw_results = search(question)
-    liste_topfive = []
+    try:
+        raw_results = await asearch(question)
+    except (httpx.HTTPError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=502, detail=f"Search backend failed: {e}")
+    liste_topfive = [clean_item(item) for item in raw_results[:5]]
 
-    def clean_item(item):
-        return {
-            "title": item.get("title", ""),
-            "url": item.get("url", ""),
-            "content": item.get("content", "")[:200] + "...",  # truncate long content
-            "score": item.get("score", 0.0)
-        }
+    return {"question": question, "searched": liste_topfive}
 
-    for item in raw_results[:5]:
-        liste_topfive.append(clean_item(item))
 
-    return {"question": question, "searched": liste_topfive}
+# --- /Research: search -> parallel scrape -> summary, streamed as Server-Sent Events ---
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _scrape(url: str) -> tuple[str, str | None]:
+    # universal_scraper is blocking (requests + parsing): run it on a worker thread
+    return url, await asyncio.to_thread(universal_scraper, url)
+
+
+def _summarize_blocking(text: str) -> str:
+    # llm_client only sets up the model gateway and response cache (no container, no
+    # vault index); imported on first use so /Search works without the Gemini SDK
+    from llm_client import llm_summarize
+
+    return llm_summarize(text)
+
+
+async def _summarize(text: str) -> str:
+    return await asyncio.to_thread(_summarize_blocking, text)
+
+
+async def research_events(question: str, pages: int, deadline: float, summarize: bool):
+    started = time.perf_counter()
+    try:
+        raw_results = await asearch(question)
+    except (httpx.HTTPError, ValueError, KeyError) as e:
+        yield sse("error", {"stage": "search", "detail": str(e)})
+        return
+    hits = [clean_item(item) for item in raw_results[:5]]
+    yield sse("search", {"question": question, "searched": hits, "elapsed": time.perf_counter() - started})
+
+    # Every candidate is fetched at once; pages are sent in the order they finish
+    collected = []
+    tasks = [asyncio.ensure_future(_scrape(hit["url"])) for hit in hits if hit["url"]]
+    try:
+        for next_page in asyncio.as_completed(tasks, timeout=deadline):
+            try:
+                url, content = await next_page
+            except TimeoutError:
+                yield sse("error", {"stage": "scrape", "detail": f"Scrape deadline of {deadline}s reached"})
+                break
+            if content and len(content) >= 250:
+                collected.append(content)
+                yield sse("page", {"url": url, "content": content, "elapsed": time.perf_counter() - started})
+                if len(collected) >= pages:
+                    break
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if summarize and collected:
+        try:
+            summary = await _summarize("\n\n---\n\n".join(collected))
+        except Exception as e:
+            yield sse("error", {"stage": "summary", "detail": str(e)})
+        else:
+            yield sse("summary", {"summary": summary, "elapsed": time.perf_counter() - started})
+
+    yield sse("done", {"pages": len(collected), "elapsed": time.perf_counter() - started})
+
+
+@app.get("/Research")
+async def research(question: str, pages: int = 2, deadline: float = 15.0, summarize: bool = True):
+    print("research :", question)
+    return StreamingResponse(
+        research_events(question, pages, deadline, summarize),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
 
+@app.get("/docker/{command:path}")
+async def execute_command(command: str, timeout: float = Query(30, gt=0), max_bytes: int = 64_000):
+    """
+    Run *command* in a container leased from the API's own warm pool, for this one
+    request only.
 
-@app.get("/docker/{command}")
-async def execute_command(command: str):
+    - Pool containers are not the agent's `my_ubuntu_container`: the agent never
+      sees what runs here, and vice versa.
+    - Each request starts in the pool's workdir, so a `cd` doesn't carry over to
+      the next call; chain it (`cd X && ls`) instead.
+    - Vault writes persist in the container they were made in, but the next
+      request may be served by another container of the pool.
+    """
     print("Executing command:", command)
-    return command
+    shell = await get_docker_shell()
+    try:
+        output = await shell.run_command(command, timeout=timeout, max_bytes=max_bytes)
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Command timed out after {timeout}s")
+    return {"command": command, "output": output}
 
 
 
@@ -0,0 +1,193 @@
+import os
+import posixpath
+import re
+import shlex
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Callable
+
+import requests
+
+from scraper import scrape_many
+from searxng import SEARCH_TIMEOUT, clean_item, search
+
+# "inprocess" calls searxng directly; "http" goes through a running theapi instance
+SEARCH_TRANSPORT = os.getenv("SEARCH_TRANSPORT", "inprocess")
+SEARCH_API_URL = os.getenv("SEARCH_API_URL", "http://127.0.0.1:8000")
+
+
+@dataclass
+class Tool:
+    """A callable the agent can invoke, with the limits the executor must respect."""
+    name: str
+    func: Callable
+    timeout: float | None = None      # seconds before call() gives up with TimeoutError
+    max_concurrency: int = 1          # calls of this tool allowed in flight at once
+    calls: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    total_time: float = 0.0
+    _slots: threading.BoundedSemaphore = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+
+class ToolRegistry:
+    """
+    In-process tool dispatch. Tools are plain functions registered with their own
+    timeout and concurrency limit; call() enforces both, so a planner can fan
+    several steps out without overloading a single backend.
+    """
+
+    def __init__(self, max_workers: int = 16):
+        self._tools: dict[str, Tool] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    def register(self, name: str, timeout: float | None = None, max_concurrency: int = 1):
+        """Decorator: expose the function as tool *name*."""
+        def decorator(func):
+            self._tools[name] = Tool(name, func, timeout, max_concurrency)
+            return func
+        return decorator
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def get(self, name: str) -> Tool:
+        try:
+            return self._tools[name]
+        except KeyError:
+            raise KeyError(f"Unknown tool '{name}'") from None
+
+    def call(self, name: str, params: dict):
+        """Run tool *name* with keyword *params*. Raises TimeoutError past the tool's timeout."""
+        tool = self.get(name)
+        tool._slots.acquire()
+        started = time.perf_counter()
+        if tool.timeout is None:
+            try:
+                return self._run(tool, params, started)
+            finally:
+                tool._slots.release()
+
+        future = self._executor.submit(self._run, tool, params, started)
+        # The slot is only freed when the call is actually done, even after a timeout
+        future.add_done_callback(lambda _: tool._slots.release())
+        try:
+            return future.result(timeout=tool.timeout)
+        except FutureTimeout:
+            with self._lock:
+                tool.timeouts += 1
+            raise TimeoutError(f"Tool '{name}' took longer than {tool.timeout}s") from None
+
+    def _run(self, tool: Tool, params: dict, started: float):
+        try:
+            return tool.func(**params)
+        except Exception:
+            with self._lock:
+                tool.failures += 1
+            raise
+        finally:
+            with self._lock:
+                tool.calls += 1
+                tool.total_time += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                tool.name: {
+                    "calls": tool.calls,
+                    "failures": tool.failures,
+                    "timeouts": tool.timeouts,
+                    "avg_time": tool.total_time / tool.calls if tool.calls else 0.0,
+                }
+                for tool in self._tools.values()
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+registry = ToolRegistry()
+
+# Shell used by execute_docker_command; set by whoever owns the container
+docker_shell = None
+
+
+def set_docker_shell(shell):
+    global docker_shell
+    docker_shell = shell
+
+
+# --- Tools ---
+
+def _search_inprocess(query: str) -> list[dict]:
+    return [clean_item(item) for item in search(query)[:5]]
+
+
+def _search_http(query: str) -> list[dict]:
+    """Same as the in-process tool, through theapi's /Search endpoint."""
+    response = requests.get(f"{SEARCH_API_URL}/Search", params={"question": query}, timeout=SEARCH_TIMEOUT + 5)
+    response.raise_for_status()
+    return response.json()["searched"]
+
+
+registry.register("Search", timeout=SEARCH_TIMEOUT + 10, max_concurrency=4)(
+    _search_http if SEARCH_TRANSPORT == "http" else _search_inprocess
+)
+
+
+@registry.register("scrape", timeout=30, max_concurrency=2)
+def scrape(urls: list[str], want: int = 2) -> list[str]:
+    return scrape_many(urls, want=want)
+
+
+# `[mkdir -p DIR &&] cat <<'EOF' > FILE` + body + `EOF`: the note-writing form the agent is told to use
+_HEREDOC_WRITE = re.compile(
+    r"\A\s*(?:mkdir\s+-p\s+(?P<dir>[^\s;&|<>]+)\s*&&\s*)?cat\s+<<\s*(?P<quote>['\"]?)(?P<tag>\w+)(?P=quote)"
+    r"\s*>\s*(?P<path>[^\s;&|<>]+)[ \t]*\n(?P<body>.*?)^(?P=tag)\n?\s*\Z",
+    re.DOTALL | re.MULTILINE,
+)
+
+
+def parse_heredoc_write(command: str) -> tuple[str, str] | None:
+    """(path, content) when *command* only writes a literal heredoc to one file, else None."""
+    match = _HEREDOC_WRITE.match(command)
+    if match is None:
+        return None
+    body = match.group("body")
+    # An unquoted delimiter means bash would expand $vars and `commands` in the body
+    if not match.group("quote") and re.search(r"[$`\\]", body):
+        return None
+    # Tilde, parameter, glob and brace expansion in the path are left to bash
+    if any(re.search(r"[~$*?\[{}]", match.group(name) or "") for name in ("path", "dir")):
+        return None
+    try:
+        (path,) = shlex.split(match.group("path"))
+        directory = shlex.split(match.group("dir"))[0] if match.group("dir") else None
+    except ValueError:
+        return None
+    # write_files creates the file's parents; any other mkdir needs the real shell
+    if directory is not None and posixpath.normpath(directory) != posixpath.dirname(posixpath.normpath(path)):
+        return None
+    return path, body
+
+
+@registry.register("execute_docker_command", timeout=130, max_concurrency=1)
+def execute_docker_command(command: str) -> str:
+    if docker_shell is None:
+        raise RuntimeError("No Docker shell configured, call tools.set_docker_shell() first")
+
+    # Note writes skip the shell entirely: the body goes into a tar stream untouched
+    heredoc = parse_heredoc_write(command)
+    if heredoc is not None:
+        path, content = heredoc
+        (written,) = docker_shell.write_files({path: content})
+        return f"Wrote {len(content.encode('utf-8'))} bytes to {written}"
+
+    # Cap the output so a runaway command can't flood session_history
+    return docker_shell.run_command(command, max_bytes=64_000, timeout=120)
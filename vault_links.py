@@ -0,0 +1,170 @@
+import math
+import posixpath
+import re
+import threading
+from dataclasses import dataclass, field
+
+from vault_tree import FRONTMATTER, VaultTreeIndex
+
+_FENCED_CODE = re.compile(r"^(```|~~~).*?^\1", re.DOTALL | re.MULTILINE)
+_WIKILINK = re.compile(r"!?\[\[([^\]|#^]+)(?:[#^][^\]|]*)?(?:\|[^\]]*)?\]\]")
+_TAG = re.compile(r"(?<![\w/&#])#([A-Za-z][\w/-]*)")
+_WORD = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+
+def terms(text: str) -> set[str]:
+    """Lowercased words of *text*, splitting PascalCase and kebab/snake case."""
+    return {word.lower() for word in _WORD.findall(text) if len(word) > 2}
+
+
+def _frontmatter_list(frontmatter: str, key: str) -> list[str]:
+    """Values of a YAML list (`key: [a, b]`, `key: a` or `key:` + `- a` lines), without a YAML parser."""
+    match = re.search(rf"^{key}:[ \t]*(.*)$", frontmatter, re.MULTILINE | re.IGNORECASE)
+    if not match:
+        return []
+    inline = match.group(1).strip()
+    if inline:
+        values = inline.strip("[]").split(",")
+    else:
+        values = []
+        for line in frontmatter[match.end():].splitlines()[1:]:
+            item = re.match(r"^\s*-\s*(.+)$", line)
+            if not item:
+                break
+            values.append(item.group(1))
+    return [value.strip().strip("'\"") for value in values if value.strip().strip("'\"")]
+
+
+@dataclass
+class Note:
+    path: str
+    title: str
+    aliases: list[str] = field(default_factory=list)
+    links: set[str] = field(default_factory=set)   # titles this note links to
+    tags: set[str] = field(default_factory=set)
+    terms: set[str] = field(default_factory=set)   # from title, aliases and tags, for ranking
+
+
+def parse_note(path: str, text: str) -> Note:
+    title = posixpath.splitext(posixpath.basename(path))[0]
+    note = Note(path, title)
+
+    match = FRONTMATTER.match(text)
+    if match:
+        frontmatter = match.group(1)
+        note.aliases = _frontmatter_list(frontmatter, "aliases") or _frontmatter_list(frontmatter, "alias")
+        note.tags.update(tag.lstrip("#") for tag in _frontmatter_list(frontmatter, "tags"))
+        text = text[match.end():]
+
+    body = _FENCED_CODE.sub("", text)
+    note.links = {posixpath.basename(target.strip()) for target in _WIKILINK.findall(body) if target.strip()}
+    note.tags.update(_TAG.findall(body))
+    note.terms = terms(" ".join([title, *note.aliases, *note.tags]))
+    return note
+
+
+class VaultLinkIndex:
+    """
+    Note titles, aliases, outgoing [[links]], backlinks and tags of the Markdown
+    notes in the vault.
+
+    Built once from the tree index, then kept current by listening to its
+    refreshes: only notes whose path changed are re-read, in one batched exec.
+    relevant_titles() picks the notes worth offering as link targets for a text.
+    """
+
+    def __init__(self, tree_index: VaultTreeIndex):
+        self.tree_index = tree_index
+        self.notes: dict[str, Note] = {}
+        self.by_title: dict[str, set[str]] = {}      # title or alias (lowercase) -> paths
+        self.backlinks: dict[str, set[str]] = {}     # title (lowercase) -> paths linking to it
+        self._lock = threading.RLock()
+        self.reads = 0
+
+        self._update(set(tree_index.entries))
+        tree_index.on_change(self._update)
+
+    def sync(self):
+        """Pick up vault changes (the update itself happens in the tree index callback)."""
+        self.tree_index.refresh()
+
+    def _is_note(self, path: str) -> bool:
+        entry = self.tree_index.entries.get(path)
+        return entry is not None and entry[0] == "f" and path.endswith(".md")
+
+    def _update(self, changed: set[str]):
+        with self._lock:
+            # A full re-list only reports what exists: drop notes that vanished meanwhile
+            gone = {path for path in self.notes if path not in self.tree_index.entries}
+            for path in gone | changed:
+                self._remove(path)
+
+            paths = sorted(path for path in changed if self._is_note(path))
+            self.reads += len(paths)
+            for path, text in self.tree_index.read_texts(paths).items():
+                self._add(parse_note(path, text))
+
+    def _add(self, note: Note):
+        self.notes[note.path] = note
+        for name in [note.title, *note.aliases]:
+            self.by_title.setdefault(name.lower(), set()).add(note.path)
+        for target in note.links:
+            self.backlinks.setdefault(target.lower(), set()).add(note.path)
+
+    def _remove(self, path: str):
+        note = self.notes.pop(path, None)
+        if note is None:
+            return
+        for name in [note.title, *note.aliases]:
+            self._discard(self.by_title, name.lower(), path)
+        for target in note.links:
+            self._discard(self.backlinks, target.lower(), path)
+
+    @staticmethod
+    def _discard(index: dict[str, set[str]], key: str, path: str):
+        paths = index.get(key)
+        if paths is not None:
+            paths.discard(path)
+            if not paths:
+                del index[key]
+
+    def titles(self) -> list[str]:
+        with self._lock:
+            return sorted({note.title for note in self.notes.values()})
+
+    def exists(self, title: str) -> bool:
+        return title.lower() in self.by_title
+
+    def backlinks_of(self, title: str) -> list[str]:
+        with self._lock:
+            return sorted(self.notes[path].title for path in self.backlinks.get(title.lower(), ()))
+
+    def tags(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        with self._lock:
+            for note in self.notes.values():
+                for tag in note.tags:
+                    counts[tag] = counts.get(tag, 0) + 1
+        return counts
+
+    def relevant_titles(self, text: str, limit: int = 20) -> list[str]:
+        """
+        Titles of the notes that best match *text*: shared words with the title,
+        aliases and tags, with a small boost for well-linked notes.
+        """
+        wanted = terms(text)
+        scored = []
+        with self._lock:
+            for note in self.notes.values():
+                overlap = len(wanted & note.terms)
+                if overlap:
+                    popularity = math.log1p(len(self.backlinks.get(note.title.lower(), ())))
+                    scored.append((overlap + 0.1 * popularity, note.title))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        titles = []
+        for _, title in scored:
+            if title not in titles:
+                titles.append(title)
+            if len(titles) == limit:
+                break
+        return titles
@@ -0,0 +1,208 @@
+import json
+import math
+import os
+import posixpath
+import re
+import threading
+import zlib
+from dataclasses import dataclass
+
+from vault_tree import FRONTMATTER, NoteIndex, VaultTreeIndex
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a about an and are as at be but by can do does for from has have how i if in into is it its of on or "
+    "so that the their then there these this to was what when where which who why will with you your".split()
+)
+INDEX_VERSION = 1
+
+
+def _stem(token: str) -> str:
+    """Plural folding only ("notes" -> "note", "entries" -> "entry"); enough for note lookups."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    return [_stem(token) for token in _TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+@dataclass
+class VaultHit:
+    path: str
+    title: str
+    score: float       # raw BM25
+    confidence: float  # BM25 / score of a perfect match on rare terms, in [0, 1]
+    snippet: str
+
+
+class VaultSearchIndex(NoteIndex):
+    """
+    BM25 full-text index over the vault's Markdown notes, answering in
+    milliseconds from memory.
+
+    Persisted as one zlib-compressed file with delta-encoded postings. On startup it
+    is reconciled with the tree index by mtime, so only notes changed since the
+    last run are re-read. Afterwards it follows the tree index's refreshes, picking
+    up notes written by docker commands.
+    """
+
+    def __init__(self, tree_index: VaultTreeIndex, path: str = ".cache/vault_search.idx",
+                 folders: tuple[str, ...] = ("02_Knowledge", "03_Notes"), k1: float = 1.2, b: float = 0.75,
+                 snippet_chars: int = 400):
+        super().__init__(tree_index, folders)
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.snippet_chars = snippet_chars
+        self._lock = threading.RLock()
+
+        self.docs: dict[int, dict] = {}              # id -> path, title, mtime, length, snippet
+        self.ids: dict[str, int] = {}                # path -> id
+        self.postings: dict[str, dict[int, int]] = {}  # term -> {id: term frequency}
+        self.doc_terms: dict[int, list[str]] = {}
+        self.total_length = 0
+        self._next_id = 0
+        self.reads = 0
+        self.queries = 0
+
+        self._load()
+        # Reconcile with the vault as it is now: re-read notes modified since the last save
+        self._update(self._out_of_date())
+        tree_index.on_change(self._update)
+
+    def _indexed_mtimes(self) -> dict[str, float]:
+        return {doc["path"]: doc["mtime"] for doc in self.docs.values()}
+
+    # --- persistence ---
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = json.loads(zlib.decompress(f.read()))
+        except (OSError, ValueError, zlib.error):
+            return
+        if data.get("version") != INDEX_VERSION or data.get("root") != self.tree_index.root:
+            return
+        for doc_id, doc in data["docs"].items():
+            self._add_doc(int(doc_id), doc)
+        for term, encoded in data["postings"].items():
+            doc_id = 0
+            entries = self.postings[term] = {}
+            for i in range(0, len(encoded), 2):
+                doc_id += encoded[i]
+                entries[doc_id] = encoded[i + 1]
+                self.doc_terms[doc_id].append(term)
+        self._next_id = max(self.docs, default=-1) + 1
+
+    def save(self):
+        with self._lock:
+            postings = {}
+            for term, entries in self.postings.items():
+                encoded, previous = [], 0
+                for doc_id in sorted(entries):
+                    encoded += [doc_id - previous, entries[doc_id]]
+                    previous = doc_id
+                postings[term] = encoded
+            data = {"version": INDEX_VERSION, "root": self.tree_index.root,
+                    "docs": self.docs, "postings": postings}
+            blob = zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"), 6)
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, self.path)
+
+    # --- incremental updates ---
+
+    def _add_doc(self, doc_id: int, doc: dict):
+        self.docs[doc_id] = doc
+        self.ids[doc["path"]] = doc_id
+        self.doc_terms[doc_id] = []
+        self.total_length += doc["length"]
+
+    def _remove(self, path: str):
+        doc_id = self.ids.pop(path, None)
+        if doc_id is None:
+            return
+        self.total_length -= self.docs.pop(doc_id)["length"]
+        for term in self.doc_terms.pop(doc_id):
+            entries = self.postings[term]
+            del entries[doc_id]
+            if not entries:
+                del self.postings[term]
+
+    def _index(self, path: str, text: str):
+        title = posixpath.splitext(posixpath.basename(path))[0]
+        body = FRONTMATTER.sub("", text, count=1)
+        # The title counts twice: a query matching the note's name is a strong signal
+        tokens = tokenize(f"{title} {title.replace('-', ' ')} {body}")
+        doc_id = self._next_id
+        self._next_id += 1
+        snippet = re.sub(r"\s+", " ", body).strip()[:self.snippet_chars]
+        self._add_doc(doc_id, {"path": path, "title": title, "mtime": self.tree_index.entries[path][2],
+                               "length": len(tokens), "snippet": snippet})
+        counts: dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.doc_terms[doc_id] = list(counts)
+
+    def _update(self, changed: set[str]):
+        with self._lock:
+            pending = self._pending(changed)
+            if pending is None:
+                return
+            removed, paths = pending
+            for path in removed:
+                self._remove(path)
+            self.reads += len(paths)
+            for path, text in self.tree_index.read_texts(paths).items():
+                self._index(path, text)
+            self.save()
+
+    # --- queries ---
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.docs) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, limit: int = 5) -> list[VaultHit]:
+        terms = set(tokenize(query))
+        with self._lock:
+            self.queries += 1
+            if not terms or not self.docs:
+                return []
+            avg_length = self.total_length / len(self.docs)
+            # Every query term matching a term unique to one note: words found in
+            # most notes (or nowhere) keep the confidence down
+            best_possible = len(terms) * math.log(1 + (len(self.docs) - 0.5) / 1.5) * (self.k1 + 1)
+            scores: dict[int, float] = {}
+            for term in terms:
+                idf = self._idf(term)
+                for doc_id, tf in self.postings.get(term, {}).items():
+                    length = self.docs[doc_id]["length"]
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+            ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+            return [
+                VaultHit(self.docs[doc_id]["path"], self.docs[doc_id]["title"], score,
+                         score / best_possible if best_possible else 0.0, self.docs[doc_id]["snippet"])
+                for doc_id, score in ranked
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": len(self.docs),
+                "terms": len(self.postings),
+                "reads": self.reads,
+                "queries": self.queries,
+                "bytes_on_disk": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            }
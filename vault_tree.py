@@ -0,0 +1,305 @@
+import hashlib
+import posixpath
+import re
+import secrets
+import threading
+from typing import Callable
+
+# One line per entry: type, size, mtime, path (tab separated)
+_ENTRY_FORMAT = r"%y\t%s\t%T@\t%p\n"
+
+# Runs inside the container. Arguments: root, stamp file, then any explicitly
+# invalidated paths. Without a stamp it lists the whole vault; with one it only
+# lists entries newer than the stamp, re-listing the direct children of every
+# changed directory so deletions and renames can be reconciled.
+_REFRESH_SCRIPT = r"""
+root=$1; stamp=$2; shift 2
+fmt='%s'
+emit_dir() {
+  printf 'D\t%%s\n' "$1"
+  find "$1" -mindepth 1 -maxdepth 1 ! -name .git -printf "C\t$fmt"
+}
+touch "$stamp.next"
+if [ -e "$stamp" ]; then
+  find "$root" -name .git -prune -o -newer "$stamp" -printf "$fmt" |
+  while IFS= read -r line; do
+    printf '%%s\n' "$line"
+    case $line in d*) emit_dir "${line##*$'\t'}" ;; esac
+  done
+  for p in "$@"; do
+    if [ -e "$p" ]; then
+      find "$p" -maxdepth 0 -printf "$fmt"
+      [ -d "$p" ] && emit_dir "$p"
+    else
+      printf 'X\t%%s\n' "$p"
+    fi
+  done
+else
+  printf 'FULL\n'
+  find "$root" -name .git -prune -o -printf "$fmt"
+  # Stamps of indexes that haven't refreshed for a day (their process is gone)
+  find /tmp -maxdepth 1 -name '.vault_tree_*.stamp' -mtime +1 -delete 2>/dev/null
+fi
+mv "$stamp.next" "$stamp"
+""" % _ENTRY_FORMAT
+
+
+MAX_NOTE_BYTES = 256 * 1024
+# YAML front matter at the top of a note; group 1 is its body
+FRONTMATTER = re.compile(r"\A---\s*\n(.*?)\n---\s*(?:\n|\Z)", re.DOTALL)
+
+
+def read_text_files(shell, paths: list[str]) -> dict[str, str]:
+    """Read many small text files from the container as one tar stream (see DockerShell.read_files)."""
+    if not paths:
+        return {}
+    return {
+        path: data[:MAX_NOTE_BYTES].decode("utf-8", errors="replace")
+        for path, data in shell.read_files(paths).items()
+    }
+
+
+class VaultTreeIndex:
+    """
+    In-process index of a directory tree inside the container (path -> type, size, mtime).
+    Built with one `find` the first time, then refreshed incrementally from a
+    `find -newer <stamp>` marker so each refresh costs O(changed) instead of O(vault).
+    """
+
+    def __init__(self, shell, root: str = "/opt/FMHY-RAG"):
+        self.shell = shell
+        self.root = root.rstrip("/") or "/"
+        digest = hashlib.sha1(self.root.encode()).hexdigest()[:12]
+        # One stamp per instance: an index sharing another's stamp would miss the changes it consumed
+        self.stamp = f"/tmp/.vault_tree_{digest}_{secrets.token_hex(4)}.stamp"
+        self.entries: dict[str, tuple[str, int, float]] = {}
+        self.children: dict[str, set[str]] = {}
+        self._invalidated: set[str] = set()
+        self._rendered: dict[tuple, str] = {}
+        # callback -> paths it failed to process, handed to it again on the next refresh
+        self._listeners: dict[Callable[[set[str]], None], set[str]] = {}
+        # Note texts read while listeners run, so the indexes share one read per changed note
+        self._texts: dict[str, str | None] | None = None
+        # refresh() runs from get_tree() and from the note indexes, possibly on several threads
+        self._lock = threading.RLock()
+
+    def on_change(self, callback: Callable[[set[str]], None]):
+        """
+        Call *callback(changed_paths)* after every refresh that changed something.
+        If it raises, the error is logged and the same paths are passed again (with
+        any new ones) on the next refresh.
+        """
+        self._listeners[callback] = set()
+
+    def read_texts(self, paths: list[str]) -> dict[str, str]:
+        """read_text_files() for the listeners: a note changed in this refresh is read only once."""
+        if self._texts is None:
+            return read_text_files(self.shell, paths)
+        missing = [path for path in paths if path not in self._texts]
+        texts = read_text_files(self.shell, missing)
+        self._texts.update({path: texts.get(path) for path in missing})  # None: gone or unreadable
+        return {path: self._texts[path] for path in paths if self._texts[path] is not None}
+
+    def _notify(self, changed: set[str]):
+        self._texts = {}
+        try:
+            for callback, failed in self._listeners.items():
+                paths = changed | failed
+                if not paths:
+                    continue
+                try:
+                    callback(paths)
+                except Exception as e:
+                    print(f"[VaultTreeIndex] Listener {getattr(callback, '__qualname__', callback)} failed, "
+                          f"retrying {len(paths)} path(s) on the next refresh: {e}")
+                    self._listeners[callback] = paths
+                else:
+                    failed.clear()
+        finally:
+            self._texts = None
+
+    def covers(self, path: str) -> bool:
+        path = path.rstrip("/") or "/"
+        return path == self.root or path.startswith(self.root + "/")
+
+    def invalidate(self, *paths: str):
+        """Force the given paths to be re-checked on the next refresh."""
+        self._invalidated.update(p.rstrip("/") for p in paths if self.covers(p))
+
+    def rebuild(self):
+        """Drop the index and the container-side stamp; the next refresh lists everything."""
+        with self._lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        self.entries.clear()
+        self.children.clear()
+        self._rendered.clear()
+        self._invalidated.clear()
+        self.shell.container.exec_run(["rm", "-f", self.stamp])
+
+    def refresh(self) -> set[str]:
+        """Bring the index up to date and return the set of paths that changed."""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> set[str]:
+        args = ["bash", "-c", _REFRESH_SCRIPT, "vault-tree", self.root, self.stamp]
+        args += sorted(self._invalidated)
+        result = self.shell.container.exec_run(args)
+        if result.exit_code != 0:
+            print(f"[VaultTreeIndex] Refresh failed for {self.root}: {result.output.decode(errors='ignore')}")
+            return set()
+        self._invalidated.clear()
+
+        lines = result.output.decode(errors="ignore").splitlines()
+        if not self.entries and (not lines or lines[0] != "FULL"):
+            # The stamp outlived our in-memory index (new process): start over
+            self._rebuild()
+            return self._refresh()
+
+        changed = set()
+        listed: dict[str, set[str]] = {}
+        new_dirs: set[str] = set()
+        full = bool(lines) and lines[0] == "FULL"
+        current_dir = None
+        for line in lines:
+            kind, _, rest = line.partition("\t")
+            if kind == "FULL":
+                self.entries.clear()
+                self.children.clear()
+            elif kind == "D":
+                current_dir = rest
+                listed[current_dir] = set()
+            elif kind == "X":
+                changed |= self._remove(rest)
+            elif kind == "C":
+                path = self._upsert(rest, changed, None if full else new_dirs)
+                if path and current_dir is not None:
+                    listed[current_dir].add(path)
+            else:
+                self._upsert(line, changed, None if full else new_dirs)
+
+        # Anything a re-listed directory no longer contains was deleted or renamed
+        for directory, present in listed.items():
+            for path in self.children.get(directory, set()) - present:
+                changed |= self._remove(path)
+
+        # A directory moved or renamed into place keeps its old mtimes, so `-newer`
+        # never lists what's inside it: list the subtree of every directory new to the index
+        if new_dirs:
+            self._list_subtrees(new_dirs, changed)
+
+        if changed:
+            self._rendered.clear()
+        self._notify(changed)
+        return changed
+
+    def _list_subtrees(self, directories: set[str], changed: set[str]):
+        tops = [d for d in sorted(directories) if not any(d.startswith(other + "/") for other in directories)]
+        result = self.shell.container.exec_run(
+            ["find", *tops, "-mindepth", "1", "-name", ".git", "-prune", "-o", "-printf", _ENTRY_FORMAT]
+        )
+        if result.exit_code != 0:
+            print(f"[VaultTreeIndex] Listing new directories failed: {result.output.decode(errors='ignore')}")
+            # Look again on the next refresh
+            self._invalidated.update(tops)
+        for line in result.output.decode(errors="ignore").splitlines():
+            self._upsert(line, changed)
+
+    def _upsert(self, line: str, changed: set[str], new_dirs: set[str] | None = None) -> str | None:
+        parts = line.split("\t", 3)
+        if len(parts) != 4:
+            return None
+        kind, size, mtime, path = parts
+        path = path.rstrip("/") or "/"
+        if new_dirs is not None and kind == "d" and path not in self.entries:
+            new_dirs.add(path)
+        entry = (kind, int(size or 0), float(mtime or 0))
+        if self.entries.get(path) != entry:
+            self.entries[path] = entry
+            changed.add(path)
+        if path != self.root:
+            self.children.setdefault(posixpath.dirname(path), set()).add(path)
+        return path
+
+    def _remove(self, path: str) -> set[str]:
+        removed = set()
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            if self.entries.pop(current, None) is not None:
+                removed.add(current)
+            stack.extend(self.children.pop(current, ()))
+        parent = self.children.get(posixpath.dirname(path))
+        if parent is not None:
+            parent.discard(path)
+        return removed
+
+    def render(self, path: str | None = None, depth: int = 2, files_only: bool = False) -> str:
+        """Render *path* like `tree -afi -L depth` (full paths, one per line, sorted)."""
+        top = (path or self.root).rstrip("/") or "/"
+        key = (top, depth, files_only)
+        with self._lock:
+            return self._render(top, key, depth, files_only)
+
+    def _render(self, top: str, key: tuple, depth: int, files_only: bool) -> str:
+        if key not in self._rendered:
+            lines = [] if files_only else [top]
+            stack = [(child, 1) for child in sorted(self.children.get(top, ()), reverse=True)]
+            while stack:
+                current, level = stack.pop()
+                kind = self.entries[current][0]
+                if not (files_only and kind == "d"):
+                    lines.append(current)
+                if kind == "d" and level < depth:
+                    stack.extend((child, level + 1) for child in sorted(self.children.get(current, ()), reverse=True))
+            self._rendered[key] = "\n".join(lines)
+        return self._rendered[key]
+
+
+class NoteIndex:
+    """
+    Base of the indexes over the Markdown notes in some top-level *folders* of a
+    tree index (full-text search, vectors): which notes they cover and which ones
+    they must (re-)read to catch up with the vault. Subclasses report the mtime
+    each note was indexed at (`_indexed_mtimes`) and register `_update` with
+    tree_index.on_change.
+    """
+
+    def __init__(self, tree_index: VaultTreeIndex, folders: tuple[str, ...]):
+        self.tree_index = tree_index
+        self.prefixes = tuple(f"{tree_index.root}/{folder.strip('/')}/" for folder in folders)
+
+    def _indexed_mtimes(self) -> dict[str, float]:
+        """Path -> mtime it was indexed at, for every note in the index."""
+        raise NotImplementedError
+
+    def _indexed(self, path: str) -> bool:
+        entry = self.tree_index.entries.get(path)
+        return entry is not None and entry[0] == "f" and path.endswith(".md") and path.startswith(self.prefixes)
+
+    def _out_of_date(self) -> set[str]:
+        """Notes modified since they were indexed, and notes never indexed."""
+        entries = self.tree_index.entries
+        mtimes = self._indexed_mtimes()
+        stale = {path for path, mtime in mtimes.items() if entries.get(path, ("", 0, None))[2] != mtime}
+        missing = {path for path in entries if self._indexed(path) and path not in mtimes}
+        return stale | missing
+
+    def _pending(self, changed: set[str]) -> tuple[set[str], list[str]] | None:
+        """
+        (paths to drop, notes to read) to apply *changed* paths, or None when
+        neither they nor a vanished note concern this index.
+        """
+        mtimes = self._indexed_mtimes()
+        # A full re-list only reports what exists: drop notes that vanished meanwhile
+        gone = {path for path in mtimes if path not in self.tree_index.entries}
+        paths = sorted(path for path in changed if self._indexed(path))
+        if not gone and not paths and not any(path in mtimes for path in changed):
+            return None
+        return gone | changed, paths
+
+    def sync(self):
+        """Pick up vault changes (the update itself happens in the tree index callback)."""
+        self.tree_index.refresh()
@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import posixpath
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, every process gets its own index files instead
+    fcntl = None
+
+import numpy as np
+
+from vault_search import tokenize
+from vault_tree import FRONTMATTER, NoteIndex, VaultTreeIndex
+
+_SECTION = re.compile(r"\n(?=#{1,6} )|\n\s*\n")
+INDEX_VERSION = 1
+
+
+def _bucket(feature: str, dim: int) -> tuple[int, float]:
+    """Stable (bucket, sign) for a feature; the sign keeps hash collisions from only adding up."""
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+def embed(text: str, dim: int = 512) -> np.ndarray:
+    """
+    Hashed bag of words + bigrams with sublinear term frequency, L2-normalized.
+    Computed locally: no model download, no network, no GPU.
+    """
+    tokens = tokenize(text)
+    counts: dict[str, int] = {}
+    for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        counts[feature] = counts.get(feature, 0) + 1
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature, count in counts.items():
+        bucket, sign = _bucket(feature, dim)
+        vector[bucket] += sign * (1.0 + np.log(count))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def chunk_note(text: str, max_words: int = 200) -> list[str]:
+    """Split a note on headings and blank lines, packing sections up to *max_words*."""
+    chunks, current, words = [], [], 0
+    for section in _SECTION.split(FRONTMATTER.sub("", text, count=1)):
+        section = section.strip()
+        if not section:
+            continue
+        size = len(section.split())
+        if current and words + size > max_words:
+            chunks.append("\n\n".join(current))
+            current, words = [], 0
+        current.append(section)
+        words += size
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+@dataclass
+class VectorHit:
+    path: str
+    title: str
+    score: float
+    snippet: str
+
+
+class VaultVectorIndex(NoteIndex):
+    """
+    Semantic index of note chunks: a contiguous float32 matrix memory-mapped from
+    `<path>.f32` (one row per chunk) plus an id table in `<path>.json`.
+
+    New chunks are appended, deleted or changed notes are tombstoned (compacted
+    once most rows are dead), and queries are answered for a whole batch with a
+    single matrix product. Inverse document frequencies are kept per hash bucket
+    and applied to the query side, so stored rows never need re-weighting.
+
+    Several processes (the CLI and theapi) can share the files: writes hold an
+    exclusive lock on `<path>.lock` and start by reloading the table when another
+    process changed it; queries hold a shared lock and reload the same way.
+    """
+
+    def __init__(self, tree_index: VaultTreeIndex, path: str = ".cache/vault_vectors", dim: int = 512,
+                 folders: tuple[str, ...] = ("00_Home", "01_Projects", "02_Knowledge", "03_Notes", "04_Journal"),
+                 snippet_chars: int = 300):
+        super().__init__(tree_index, folders)
+        self.path = path if fcntl is not None else f"{path}.{os.getpid()}"
+        self.dim = dim
+        self.snippet_chars = snippet_chars
+        self._lock = threading.RLock()
+
+        self.matrix: np.memmap | None = None
+        self._reset()
+        self._table_stamp = None  # (inode, mtime, size) of the table we loaded or wrote last
+        self.reads = 0
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Loaded (and reconciled with the vault) by the first update
+        self._update(set())
+        tree_index.on_change(self._update)
+
+    def _reset(self):
+        self.rows: list[dict | None] = []  # row -> path, title, mtime, snippet (None = tombstone)
+        self.by_path: dict[str, list[int]] = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.df = np.zeros(self.dim, dtype=np.float32)  # live chunks with a non-zero weight per bucket
+
+    def _indexed_mtimes(self) -> dict[str, float]:
+        return {path: self.rows[rows[0]]["mtime"] for path, rows in self.by_path.items()}
+
+    # --- storage ---
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Inter-process lock on the index files (a no-op where every process has its own)."""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _stat_table(self):
+        try:
+            info = os.stat(f"{self.path}.json")
+        except OSError:
+            return None
+        return info.st_ino, info.st_mtime_ns, info.st_size
+
+    def _reload_if_changed(self) -> bool:
+        """Re-read the table when another process wrote it since we last did. Needs the file lock."""
+        if self.matrix is not None and self._stat_table() == self._table_stamp:
+            return False
+        self._reset()
+        self._load()
+        return True
+
+    def _open(self, capacity: int, mode: str = "r+"):
+        self.matrix = np.memmap(f"{self.path}.f32", dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+
+    def _load(self):
+        self._table_stamp = self._stat_table()
+        try:
+            with open(f"{self.path}.json", encoding="utf-8") as f:
+                table = json.load(f)
+            if table["version"] != INDEX_VERSION or table["dim"] != self.dim or table["root"] != self.tree_index.root:
+                raise ValueError("index built with other settings")
+            self._open(table["capacity"])
+        except (OSError, ValueError, KeyError):
+            self._open(256, mode="w+")
+            return
+        self.rows = table["rows"]
+        self.alive = np.array([row is not None for row in self.rows], dtype=bool)
+        for i, row in enumerate(self.rows):
+            if row is not None:
+                self.by_path.setdefault(row["path"], []).append(i)
+        if self.rows:
+            self.df = (self.matrix[:len(self.rows)][self.alive] != 0).sum(axis=0).astype(np.float32)
+
+    def save(self):
+        with self._lock:
+            self.matrix.flush()
+            table = {"version": INDEX_VERSION, "dim": self.dim, "root": self.tree_index.root,
+                     "capacity": self.matrix.shape[0], "rows": self.rows}
+            tmp = f"{self.path}.json.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(table, f, separators=(",", ":"))
+            os.replace(tmp, f"{self.path}.json")
+            self._table_stamp = self._stat_table()
+
+    def _grow(self, needed: int):
+        capacity = self.matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self.matrix.flush()
+        self.matrix = None
+        with open(f"{self.path}.f32", "r+b") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._open(capacity)
+
+    def _compact(self):
+        """Rewrite the matrix without tombstones once they make up most of it."""
+        keep = np.flatnonzero(self.alive)
+        vectors = np.array(self.matrix[keep])
+        self.rows = [self.rows[i] for i in keep]
+        self.matrix[:len(keep)] = vectors
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.by_path = {}
+        for i, row in enumerate(self.rows):
+            self.by_path.setdefault(row["path"], []).append(i)
+
+    # --- incremental updates ---
+
+    def _remove(self, path: str):
+        for i in self.by_path.pop(path, ()):
+            self.df -= self.matrix[i] != 0
+            self.rows[i] = None
+            self.alive[i] = False
+
+    def _append(self, path: str, text: str):
+        title = posixpath.splitext(posixpath.basename(path))[0]
+        chunks = chunk_note(text) or [title]
+        start = len(self.rows)
+        self._grow(start + len(chunks))
+        vectors = np.stack([embed(f"{title}\n{chunk}", self.dim) for chunk in chunks])
+        self.matrix[start:start + len(chunks)] = vectors
+        self.df += (vectors != 0).sum(axis=0)
+        mtime = self.tree_index.entries[path][2]
+        for chunk in chunks:
+            snippet = re.sub(r"\s+", " ", chunk).strip()[:self.snippet_chars]
+            self.rows.append({"path": path, "title": title, "mtime": mtime, "snippet": snippet})
+        self.alive = np.concatenate([self.alive, np.ones(len(chunks), dtype=bool)])
+        self.by_path[path] = list(range(start, start + len(chunks)))
+
+    def _update(self, changed: set[str]):
+        with self._lock, self._file_lock(exclusive=True):
+            if self._reload_if_changed():
+                # Written by another process (or never loaded): catch up with the vault as we see it,
+                # skipping notes the other process already embedded at their current mtime
+                entries = self.tree_index.entries
+                current = {path for path, mtime in self._indexed_mtimes().items()
+                           if path in entries and entries[path][2] == mtime}
+                changed = (changed - current) | self._out_of_date()
+            pending = self._pending(changed)
+            if pending is None:
+                return
+            removed, paths = pending
+            for path in removed:
+                self._remove(path)
+            self.reads += len(paths)
+            for path, text in self.tree_index.read_texts(paths).items():
+                self._append(path, text)
+            if len(self.rows) > 64 and self.alive.sum() < len(self.rows) / 2:
+                self._compact()
+            self.save()
+
+    # --- queries ---
+
+    def search_many(self, queries: list[str], k: int = 5) -> list[list[VectorHit]]:
+        """Top-*k* notes for every query, scored together with one matrix product."""
+        with self._lock, self._file_lock(exclusive=False):
+            self._reload_if_changed()
+            count = len(self.rows)
+            if not queries or not self.alive.any():
+                return [[] for _ in queries]
+            live = int(self.alive.sum())
+            idf = np.log((1 + live) / (1 + self.df)) + 1
+            weighted = np.stack([embed(query, self.dim) for query in queries]) * idf * idf
+            scores = self.matrix[:count] @ weighted.T            # (chunks, queries)
+            scores[~self.alive] = -np.inf
+
+            # Several chunks of one note can rank high: take a wider cut, then keep the best per note
+            wide = min(count, k * 4)
+            results = []
+            for column in scores.T:
+                top = np.argpartition(-column, wide - 1)[:wide]
+                hits, seen = [], set()
+                for i in top[np.argsort(-column[top])]:
+                    row = self.rows[i]
+                    if row is None or column[i] <= 0 or row["path"] in seen:
+                        continue
+                    seen.add(row["path"])
+                    hits.append(VectorHit(row["path"], row["title"], float(column[i]), row["snippet"]))
+                    if len(hits) == k:
+                        break
+                results.append(hits)
+            return results
+
+    def search(self, query: str, k: int = 5) -> list[VectorHit]:
+        return self.search_many([query], k)[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "chunks": int(self.alive.sum()),
+                "tombstones": int((~self.alive).sum()),
+                "notes": len(self.by_path),
+                "capacity": self.matrix.shape[0],
+                "reads": self.reads,
+            }